@@ -0,0 +1,137 @@
+import re
+from Simulator.InstructionClass import InstructionTemplate
+
+# Operand kinds of each op, in source order
+OPERAND_FORMATS = {
+    "add": ("register", "register", "register"),
+    "addi": ("register", "register", "immediate"),
+    "fadd": ("register", "register", "register"),
+    "fsub": ("register", "register", "register"),
+    "fmul": ("register", "register", "register"),
+    "fdiv": ("register", "register", "register"),
+    "fld": ("register", "memory"),
+    "fsd": ("register", "memory"),
+    "bne": ("register", "register", "target"),
+}
+
+LABEL = re.compile(r"\s*([A-Za-z_.][\w.]*)\s*:(.*)$", re.DOTALL)
+LABEL_NAME = re.compile(r"[A-Za-z_.][\w.]*$")
+REGISTER = re.compile(r"[A-Za-z$][\w$]*$")
+IMMEDIATE = re.compile(r"[+-]?\d+$")
+MEMORY = re.compile(r"([+-]?\d+)\s*\(\s*([A-Za-z$][\w$]*)\s*\)$")
+PARSE_CACHE_SIZE = 4096
+
+
+# Assembled program indexed by PC, like the sparse list it replaces: program[pc] is the instruction at that address
+class Program:
+    def __init__(self, templates, symbols):
+        self.templates = templates
+        # Label -> address
+        self.symbols = symbols
+
+    def __len__(self):
+        return len(self.templates) * 4
+
+    def __getitem__(self, pc):
+        return self.templates[pc >> 2]
+
+
+# Label and instruction text of a source line, either may be None; comments start with '#'
+def splitLine(line):
+    label = None
+    if "#" in line:
+        line = line.split("#", 1)[0]
+    if ":" in line:
+        match = LABEL.match(line)
+        if match is not None:
+            label, line = match.group(1), match.group(2)
+    line = line.strip()
+    return label, line or None
+
+
+# Pass one: address of every label, and the size of the program in bytes
+def readSymbols(lines, fileName):
+    symbols = {}
+    definedOn = {}
+    pc = 0
+    for lineNumber, line in enumerate(lines, 1):
+        label, text = splitLine(line)
+        if label is not None:
+            if label in symbols:
+                raise ValueError(f"{fileName}:{lineNumber}: label '{label}' is already defined on line "
+                                 f"{definedOn[label]}")
+            symbols[label] = pc
+            definedOn[label] = lineNumber
+        if text is not None:
+            pc += 4
+    return symbols, pc
+
+
+# Pass two for one instruction: check its operands and resolve a branch target label to its address.
+# Returns the instruction text with the target resolved, the op and its d, s1, s2 fields.
+def parseInstruction(text, symbols, size):
+    parts = text.split(None, 1)
+    op = parts[0]
+    formats = OPERAND_FORMATS.get(op)
+    if formats is None:
+        raise ValueError(f"unknown instruction '{op}'")
+    operandText = parts[1] if len(parts) > 1 else ""
+    operands = [operand.strip() for operand in operandText.split(",")] if operandText.strip() else []
+    if len(operands) != len(formats):
+        raise ValueError(f"'{op}' takes {len(formats)} operands, got {len(operands)}")
+    fields = []
+    for operand, kind in zip(operands, formats):
+        if kind == "register":
+            if not REGISTER.match(operand):
+                raise ValueError(f"'{operand}' is not a register")
+            fields.append(operand)
+        elif kind == "immediate":
+            if not IMMEDIATE.match(operand):
+                raise ValueError(f"'{operand}' is not an integer")
+            fields.append(operand)
+        elif kind == "memory":
+            match = MEMORY.match(operand)
+            if match is None:
+                raise ValueError(f"'{operand}' is not a memory operand offset(register)")
+            fields.extend(match.groups())
+        else:
+            if IMMEDIATE.match(operand):
+                target = int(operand)
+            elif not LABEL_NAME.match(operand):
+                raise ValueError(f"'{operand}' is not a label or an address")
+            elif operand not in symbols:
+                raise ValueError(f"undefined label '{operand}'")
+            else:
+                target = symbols[operand]
+                # The text keeps the resolved address, so the instruction decodes on its own
+                head, tail = operandText.rsplit(",", 1)
+                operandText = head + "," + tail.replace(operand, str(target))
+            if target % 4 or not 0 <= target <= size:
+                raise ValueError(f"branch target {target} is not an instruction address in 0-{size}")
+            fields.append(str(target))
+    return (op + " " + operandText.strip(), op) + tuple(fields)
+
+
+# Two passes over the file, reading it line by line, so the source is never held in memory
+def assembleFile(fileName):
+    with open(fileName, "r") as f:
+        symbols, size = readSymbols(f, fileName)
+    templates = []
+    # Generated programs repeat the same lines, which are parsed once and share their strings
+    parsed = {}
+    with open(fileName, "r") as f:
+        for lineNumber, line in enumerate(f, 1):
+            label, text = splitLine(line)
+            if text is None:
+                continue
+            fields = parsed.get(text)
+            if fields is None:
+                try:
+                    fields = parseInstruction(text, symbols, size)
+                except ValueError as error:
+                    raise ValueError(f"{fileName}:{lineNumber}: {error}")
+                if len(parsed) >= PARSE_CACHE_SIZE:
+                    parsed.clear()
+                parsed[text] = fields
+            templates.append(InstructionTemplate(len(templates) * 4, *fields))
+    return Program(templates, symbols)
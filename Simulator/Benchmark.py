@@ -0,0 +1,122 @@
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import time
+from Simulator.Assembler import assembleFile
+from Simulator.InstructionClass import Instruction
+from Simulator.KernelGenerator import writeKernel
+from Simulator.Memory import loadMemory
+from Simulator.Processor import Processor
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+BENCHMARK_COLUMNS = ["workload", "NF", "NW", "NR", "NB", "NP", "cycles", "instructions", "ipc", "seconds",
+                     "cyclesPerSecond", "instructionsPerSecond", "peakMemoryKB"]
+
+
+# Peak resident memory of this process in KB, None where the platform does not report it
+def peakMemory():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux KB
+    return peak // 1024 if platform.system() == "Darwin" else peak
+
+
+# One timed detailed run, in a process of its own so its peak memory is not that of an earlier run
+def runBenchmark(workload, programFile, memoryFile, config, repeat):
+    program = assembleFile(programFile)
+    best = None
+    for i in range(repeat):
+        Instruction.id = 0
+        processor = Processor(dict(config, traceLevel="none"), loadMemory(memoryFile), program)
+        start = time.perf_counter()
+        while not processor.finished:
+            processor.step()
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    cycles = processor.cycle
+    instructions = processor.counters.instructions
+    return {"workload": workload, "NF": config["NF"], "NW": config["NW"], "NR": config["NR"], "NB": config["NB"],
+            "NP": config["NP"], "cycles": cycles, "instructions": instructions,
+            "ipc": instructions / cycles if cycles else 0.0, "seconds": best,
+            "cyclesPerSecond": cycles / best if best else None,
+            "instructionsPerSecond": instructions / best if best else None, "peakMemoryKB": peakMemory()}
+
+
+# NF follows NW and NP is sized so that renaming never limits a large ROB
+def sweepConfigs(NRs, NWs, NBs, config=None):
+    configs = []
+    for NR, NW, NB in itertools.product(NRs, NWs, NBs):
+        configs.append(dict(config or {}, NF=NW, NW=NW, NR=NR, NB=NB, NP=NR + 32))
+    return configs
+
+
+# Write the generated kernels into directory, returning (name, program file, memory file) of each
+def writeKernels(kernels, directory, trips):
+    os.makedirs(directory, exist_ok=True)
+    workloads = []
+    for name, parameters in kernels.items():
+        programFile = os.path.join(directory, f"{name}.txt")
+        memoryFile = os.path.join(directory, f"{name}.mem")
+        writeKernel(programFile, memoryFile, **dict({"trips": trips}, **parameters))
+        workloads.append((name, programFile, memoryFile))
+    return workloads
+
+
+# Every workload on every configuration, each run in a fresh worker process
+def runSuite(workloads, configs, repeat=1, report=None):
+    rows = []
+    with multiprocessing.Pool(1, maxtasksperchild=1) as pool:
+        for (name, programFile, memoryFile), config in itertools.product(workloads, configs):
+            row = pool.apply(runBenchmark, (name, programFile, memoryFile, config, repeat))
+            rows.append(row)
+            if report is not None:
+                report(row)
+    return rows
+
+
+def formatRow(row):
+    return f"{row['workload']:>10}  NW={row['NW']:<3} NR={row['NR']:<4} NB={row['NB']:<3} " \
+           f"{row['cycles']:>9} cycles  {row['cyclesPerSecond']:>10.0f} cycles/s  " \
+           f"{row['instructionsPerSecond']:>10.0f} inst/s  {row['peakMemoryKB']} KB"
+
+
+# Rows of an earlier saveBenchmarks JSON file, by workload and configuration
+def loadBaseline(fileName):
+    with open(fileName, "r") as f:
+        rows = json.load(f)["runs"]
+    return {benchmarkKey(row): row for row in rows}
+
+
+def benchmarkKey(row):
+    return row["workload"], row["NW"], row["NR"], row["NB"]
+
+
+# Throughput of each run relative to the baseline's run of the same workload and configuration, below 1 is slower
+def compareBaseline(rows, baseline):
+    ratios = []
+    for row in rows:
+        previous = baseline.get(benchmarkKey(row))
+        if previous is not None and previous["cyclesPerSecond"]:
+            ratios.append((row, row["cyclesPerSecond"] / previous["cyclesPerSecond"]))
+    return ratios
+
+
+# JSON with the host it ran on, or one CSV row per run, by file extension
+def saveBenchmarks(rows, fileName):
+    with open(fileName, "w", newline="") as f:
+        if fileName.endswith(".csv"):
+            writer = csv.DictWriter(f, fieldnames=BENCHMARK_COLUMNS)
+            writer.writeheader()
+            writer.writerows(rows)
+        else:
+            json.dump({"host": {"python": platform.python_version(), "implementation": platform.python_implementation(),
+                                "machine": platform.machine(), "system": platform.system()},
+                       "runs": rows}, f, indent=2)
@@ -0,0 +1,182 @@
+PREDICTORS = ["1bit", "2bit", "gshare", "tournament"]
+
+
+def checkPowerOfTwo(name, value):
+    if value <= 0 or value & (value - 1):
+        raise ValueError(f"{name} must be a power of two, got {value}")
+
+
+# Direction predictors are indexed by the instruction word address and trained when a branch commits. Those with a
+# global history take each prediction into it at once and are trained with the history the branch was predicted with.
+class BranchPredictor:
+    name = None
+
+    def __init__(self, entries):
+        checkPowerOfTwo("Predictor entries", entries)
+        self.entries = entries
+        self.mask = entries - 1
+
+    def index(self, pc):
+        return (pc >> 2) & self.mask
+
+    def predict(self, pc):
+        raise NotImplementedError
+
+    def update(self, pc, taken, history=None):
+        raise NotImplementedError
+
+    # Global history of branch outcomes, none for the predictors that do not keep one
+    def getHistory(self):
+        return 0
+
+    # Shift a predicted outcome into the history before the branch resolves
+    def speculate(self, taken):
+        pass
+
+    # Back to the history saved before a squashed prediction
+    def restore(self, history):
+        pass
+
+
+# Last outcome of the branch, initialized to not taken
+class OneBitPredictor(BranchPredictor):
+    name = "1bit"
+
+    def __init__(self, entries):
+        BranchPredictor.__init__(self, entries)
+        self.table = [False] * entries
+
+    def predict(self, pc):
+        return self.table[self.index(pc)]
+
+    def update(self, pc, taken, history=None):
+        self.table[self.index(pc)] = taken
+
+
+# 2-bit saturating counters, initialized to weakly not taken
+class TwoBitPredictor(BranchPredictor):
+    name = "2bit"
+
+    def __init__(self, entries):
+        BranchPredictor.__init__(self, entries)
+        self.counters = bytearray([1]) * entries
+
+    def predictIndex(self, index):
+        return self.counters[index] >= 2
+
+    def updateIndex(self, index, taken):
+        counter = self.counters[index]
+        if taken:
+            self.counters[index] = min(counter + 1, 3)
+        else:
+            self.counters[index] = max(counter - 1, 0)
+
+    def predict(self, pc):
+        return self.predictIndex(self.index(pc))
+
+    def update(self, pc, taken, history=None):
+        self.updateIndex(self.index(pc), taken)
+
+
+# 2-bit counters indexed by the branch address XOR the global history. The history holds the predicted outcomes of
+# the branches in flight; a flush restores it and a commit trains the counter the branch was predicted with. With no
+# history given, update trains in order and shifts the outcome in, as the functional emulator does.
+class GsharePredictor(TwoBitPredictor):
+    name = "gshare"
+
+    def __init__(self, entries, historyBits):
+        TwoBitPredictor.__init__(self, entries)
+        self.historyMask = (1 << historyBits) - 1
+        self.history = 0
+
+    def index(self, pc, history=None):
+        return ((pc >> 2) ^ (self.history if history is None else history)) & self.mask
+
+    def update(self, pc, taken, history=None):
+        self.updateIndex(self.index(pc, history), taken)
+        if history is None:
+            self.speculate(taken)
+
+    def getHistory(self):
+        return self.history
+
+    def speculate(self, taken):
+        self.history = ((self.history << 1) | int(taken)) & self.historyMask
+
+    def restore(self, history):
+        self.history = history
+
+
+# Per-address 2-bit choosers pick between a bimodal and a gshare prediction
+class TournamentPredictor(BranchPredictor):
+    name = "tournament"
+
+    def __init__(self, entries, historyBits):
+        BranchPredictor.__init__(self, entries)
+        self.local = TwoBitPredictor(entries)
+        self.gshare = GsharePredictor(entries, historyBits)
+        # 0-1 prefer the bimodal predictor, 2-3 prefer gshare
+        self.chooser = TwoBitPredictor(entries)
+
+    def predict(self, pc):
+        if self.chooser.predict(pc):
+            return self.gshare.predict(pc)
+        return self.local.predict(pc)
+
+    def update(self, pc, taken, history=None):
+        localCorrect = self.local.predict(pc) == taken
+        gshareCorrect = self.gshare.predictIndex(self.gshare.index(pc, history)) == taken
+        if localCorrect != gshareCorrect:
+            self.chooser.update(pc, gshareCorrect)
+        self.local.update(pc, taken)
+        self.gshare.update(pc, taken, history)
+
+    def getHistory(self):
+        return self.gshare.getHistory()
+
+    def speculate(self, taken):
+        self.gshare.speculate(taken)
+
+    def restore(self, history):
+        self.gshare.restore(history)
+
+
+def createPredictor(name, entries, historyBits):
+    if name == "1bit":
+        return OneBitPredictor(entries)
+    if name == "2bit":
+        return TwoBitPredictor(entries)
+    if name == "gshare":
+        return GsharePredictor(entries, historyBits)
+    if name == "tournament":
+        return TournamentPredictor(entries, historyBits)
+    raise ValueError(f"Unknown branch predictor '{name}', expected one of {', '.join(PREDICTORS)}")
+
+
+# Direct-mapped, tagged BTB indexed by the address bits from bit 4 up (bits 7-4 for 16 entries)
+class BranchTargetBuffer:
+    def __init__(self, entries):
+        checkPowerOfTwo("BTB entries", entries)
+        self.size = entries
+        self.mask = entries - 1
+        self.tags = [None] * entries
+        self.targets = [None] * entries
+        self.hits = 0
+        self.misses = 0
+
+    def index(self, pc):
+        return (pc >> 4) & self.mask
+
+    # Target of the branch at pc, or None if it is not in the buffer
+    def lookup(self, pc):
+        index = self.index(pc)
+        if self.tags[index] == pc:
+            self.hits += 1
+            return self.targets[index]
+        self.misses += 1
+        return None
+
+    def insert(self, pc, target):
+        index = self.index(pc)
+        self.tags[index] = pc
+        self.targets[index] = target
@@ -0,0 +1,38 @@
+import os
+import pickle
+import struct
+import zlib
+from Simulator.InstructionClass import Instruction
+
+# File layout: header, then the compressed pickle of the whole Processor and the instruction id counter
+CHECKPOINT_MAGIC = b"RVCK"
+CHECKPOINT_VERSION = 11
+HEADER = struct.Struct("<4sHI")
+
+
+# Write the complete simulator state, replacing the file atomically so a crash never leaves half a checkpoint
+def saveCheckpoint(processor, fileName):
+    # The open pipeline trace and timeline stay with the running process
+    pipelineTrace, timeline = processor.pipelineTrace, processor.timeline
+    processor.pipelineTrace = processor.timeline = None
+    try:
+        payload = zlib.compress(pickle.dumps((Instruction.id, processor), pickle.HIGHEST_PROTOCOL))
+    finally:
+        processor.pipelineTrace, processor.timeline = pipelineTrace, timeline
+    temporaryFile = fileName + ".tmp"
+    with open(temporaryFile, "wb") as f:
+        f.write(HEADER.pack(CHECKPOINT_MAGIC, CHECKPOINT_VERSION, processor.cycle))
+        f.write(payload)
+    os.replace(temporaryFile, fileName)
+
+
+# Rebuild the Processor saved by saveCheckpoint, ready to continue with begin()
+def loadCheckpoint(fileName):
+    with open(fileName, "rb") as f:
+        magic, version, cycle = HEADER.unpack(f.read(HEADER.size))
+        if magic != CHECKPOINT_MAGIC or version != CHECKPOINT_VERSION:
+            raise ValueError(f"{fileName} is not a simulator checkpoint")
+        instructionId, processor = pickle.loads(zlib.decompress(f.read()))
+    # Instruction ids order the ready queues, so new ids must continue where the saved run stopped
+    Instruction.id = instructionId
+    return processor
@@ -0,0 +1,72 @@
+class FunctionalEmulator:
+    def __init__(self, MainMemory, instructionFile, predictor=None, BTB=None):
+        self.MainMemory = MainMemory
+        self.instructionFile = instructionFile
+        self.PC = 0
+        # Architectural register values by name, registers never written read as 0
+        self.registers = {}
+        self.instructions = 0
+        self.committed = {}
+        self.branches = 0
+        # Optional branch predictor and BTB trained on every branch, so a detailed model can start warm
+        self.predictor = predictor
+        self.BTB = BTB
+        # Optional TraceWriter recording every executed instruction, for trace-driven runs of the detailed model
+        self.traceWriter = None
+
+    def read(self, register):
+        return self.registers.setdefault(register, 0)
+
+    # Execute the instruction at PC, returns False once the program has finished
+    def step(self):
+        if self.PC >= len(self.instructionFile):
+            return False
+        instruction = self.instructionFile[self.PC]
+        op, d, s1, s2 = instruction.op, instruction.d, instruction.s1, instruction.s2
+        nextPC = self.PC + 4
+        result = None
+        address = taken = None
+        if op == "add":
+            result = int(self.read(s1)) + int(self.read(s2))
+        elif op == "addi":
+            result = int(self.read(s1)) + int(s2)
+        elif op == "fld":
+            address = int(s1) + int(self.read(s2))
+            result = self.MainMemory[address]
+        elif op == "fsd":
+            address = int(self.read(s2)) + int(d)
+            self.MainMemory[address] = self.read(s1)
+        elif op == "fadd":
+            result = float(self.read(s1)) + float(self.read(s2))
+        elif op == "fsub":
+            result = float(self.read(s1)) - float(self.read(s2))
+        elif op == "fmul":
+            result = float(self.read(s1)) * float(self.read(s2))
+        elif op == "fdiv":
+            result = float(self.read(s1)) / float(self.read(s2))
+        elif op == "bne":
+            taken = float(self.read(s1)) != float(self.read(s2))
+            self.branches += 1
+            if self.predictor is not None:
+                if self.predictor.predict(self.PC) and self.BTB.lookup(self.PC) is None:
+                    self.BTB.insert(self.PC, instruction.target)
+                self.predictor.update(self.PC, taken)
+            if taken:
+                nextPC = instruction.target
+        if op not in ["fsd", "bne"]:
+            self.registers[d] = result
+        if self.traceWriter is not None:
+            self.traceWriter.write(self.PC, instruction.instruction, address, taken)
+        self.committed[op] = self.committed.get(op, 0) + 1
+        self.instructions += 1
+        self.PC = nextPC
+        return True
+
+    # Run up to count instructions (all of them if None), returns how many were executed
+    def run(self, count=None):
+        executed = 0
+        while count is None or executed < count:
+            if not self.step():
+                break
+            executed += 1
+        return executed
@@ -1,33 +1,95 @@
+from Simulator.RegisterHandler import registerName
+
+
+def checkForRegister(s):
+    if s is None:
+        return False
+    if s[0] in ['-', '+']:
+        return not s[1:].isdigit()
+    return not s.isdigit()
+
+
+# Immutable pre-decoded form of one static instruction, built once per PC at load time
+class InstructionTemplate:
+    __slots__ = ("pc", "instruction", "op", "d", "s1", "s2", "s1IsRegister", "s2IsRegister", "target")
+    # Effective address and branch outcome, only known in advance for instructions read from a trace
+    address = None
+    taken = None
+
+    def __init__(self, pc, instruction, op, d, s1, s2=None):
+        if op == "fsd":
+            d, s1 = s1, d
+        elif op == "bne":
+            d, s1, s2 = s2, d, s1
+        setter = object.__setattr__
+        setter(self, "pc", pc)
+        setter(self, "instruction", instruction)
+        setter(self, "op", op)
+        setter(self, "d", d)
+        setter(self, "s1", s1)
+        setter(self, "s2", s2)
+        setter(self, "s1IsRegister", checkForRegister(s1))
+        setter(self, "s2IsRegister", checkForRegister(s2))
+        setter(self, "target", int(d) if op == "bne" else None)
+
+    def __setattr__(self, key, value):
+        raise AttributeError("InstructionTemplate is immutable")
+
+    # Pickled as its source text, since the immutable slots cannot be restored one by one
+    def __reduce__(self):
+        return decodeInstruction, (self.instruction, self.pc)
+
+    def __str__(self):
+        return self.instruction
+
+
+# Parse the text of one instruction into its template
+def decodeInstruction(instruction, pc):
+    return InstructionTemplate(pc, instruction, *decodeFields(instruction, pc))
+
+
+# Op and d, s1, s2 fields of the text of one instruction
+def decodeFields(instruction, pc):
+    op, inst = instruction.split(" ", 1)
+    if op in ["add", "addi", "fadd", "fsub", "fmul", "fdiv"]:
+        d, s1, s2 = inst.split(",")
+    elif op in ["fld", "fsd"]:
+        d, inst = inst.split(",")
+        s1, s2 = inst.split("(")
+        s2 = s2.replace(")", "")
+    elif op in ["bne"]:
+        d, s1, s2 = inst.split(",")
+    else:
+        raise ValueError(f"Unknown instruction at {pc}: '{instruction}'")
+    return op.strip(), d.strip(), s1.strip(), s2.strip()
+
+
 class Instruction:
     id = 0
 
-    def __init__(self, op_name, d, s1, s2=None):
+    def __init__(self, template):
         self.instructionId = Instruction.id
         Instruction.id = Instruction.id + 1
-        if op_name == "fsd" or op_name == "bne":
-            if op_name == "fsd":
-                self.d = s1
-                self.s1 = d
-                self.s2 = s2
-            else:
-                self.d = s2
-                self.s1 = d
-                self.s2 = s1
-            self.op = op_name
-            self.state = "Decode"
-            self.dR = None
-            self.instruction = ''
-        else:
-            self.op = op_name
-            self.d = d
-            self.s1 = s1
-            self.s2 = s2
-            self.state = "Decode"
-            self.dR = None
-            self.instruction = ''
+        self.template = template
+        self.pc = template.pc
+        self.op = template.op
+        self.d = template.d
+        self.s1 = template.s1
+        self.s2 = template.s2
+        self.state = "Decode"
+        self.dR = None
+        self.predictedTaken = None
+        self.instruction = template.instruction
+        self.decodeCycle = None
+        # Rename state, see Processor.registerMapping
+        self.allocated = []
+        self.freeHead = None
+        self.snapshot = None
+        # Branch predictor history before the instruction, see Processor.decode
+        self.history = None
 
     def __str__(self):
-        return f"Id: {self.instructionId}, Inst:'[{self.instruction}]', State:'{self.state}', op:'{self.op}', d:'{self.dR if self.dR else self.d}', s1:'{self.s1}', s2:'{self.s2}'"
+        return f"Id: {self.instructionId}, Inst:'[{self.instruction}]', State:'{self.state}', op:'{self.op}', d:'{registerName(self.dR) if self.dR is not None else self.d}', s1:'{registerName(self.s1)}', s2:'{registerName(self.s2)}'"
 
     def updateStage(self, state):
         self.state = state
@@ -0,0 +1,161 @@
+import bz2
+import collections
+import gzip
+import logging
+import lzma
+from Simulator.InstructionClass import InstructionTemplate, decodeFields
+from Simulator.Memory import SparseMemory
+from Simulator.Processor import Processor
+from Simulator.TraceLog import TRACE_STAGE
+
+# Trace files are text, compressed according to their extension
+TRACE_OPENERS = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}
+
+
+def openTrace(fileName, mode):
+    for extension, opener in TRACE_OPENERS.items():
+        if fileName.endswith(extension):
+            return opener(fileName, mode + "t")
+    return open(fileName, mode)
+
+
+# One dynamic instruction of a trace: "pc instruction", then "@address" for loads and stores and T or N for branches
+class TraceRecord(InstructionTemplate):
+    __slots__ = ("address", "taken")
+
+    def __init__(self, pc, instruction, op, d, s1, s2, address=None, taken=None):
+        InstructionTemplate.__init__(self, pc, instruction, op, d, s1, s2)
+        setter = object.__setattr__
+        setter(self, "address", address)
+        setter(self, "taken", taken)
+
+    def __reduce__(self):
+        return parseRecord, (formatRecord(self.pc, self.instruction, self.address, self.taken),)
+
+
+def formatRecord(pc, instruction, address=None, taken=None):
+    record = f"{pc} {instruction}"
+    if address is not None:
+        record += f" @{address}"
+    if taken is not None:
+        record += " T" if taken else " N"
+    return record
+
+
+def parseRecord(line):
+    pc, instruction = line.split(None, 1)
+    pc = int(pc)
+    address = taken = None
+    op = instruction.split(None, 1)[0]
+    if op in ["fld", "fsd"]:
+        if "@" not in instruction:
+            raise ValueError(f"'{op}' record has no @address")
+        instruction, address = instruction.rsplit("@", 1)
+        address = int(address)
+    elif op == "bne":
+        instruction, outcome = instruction.rsplit(None, 1)
+        if outcome not in ["T", "N"]:
+            raise ValueError(f"branch outcome '{outcome}' is not T or N")
+        taken = outcome == "T"
+    instruction = instruction.strip()
+    return TraceRecord(pc, instruction, *decodeFields(instruction, pc), address, taken)
+
+
+# Records of a trace file one at a time, so a trace of any length is read in constant memory
+def readTrace(fileName):
+    with openTrace(fileName, "r") as f:
+        for lineNumber, line in enumerate(f, 1):
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            try:
+                yield parseRecord(line)
+            except (ValueError, IndexError) as error:
+                raise ValueError(f"{fileName}:{lineNumber}: {error}")
+
+
+class TraceWriter:
+    def __init__(self, fileName):
+        self.file = openTrace(fileName, "w")
+
+    def write(self, pc, instruction, address=None, taken=None):
+        self.file.write(formatRecord(pc, instruction, address, taken) + "\n")
+
+    def close(self):
+        self.file.close()
+
+
+# Front end over a trace. Records stay in a window from fetch until they commit, so the ones squashed by a flush can
+# be fetched again; the window holds no more than the instructions in flight.
+class InstructionTrace:
+    def __init__(self, records):
+        self.records = iter(records)
+        self.window = collections.deque()
+        # Sequence numbers, in trace order, of the first record in the window and of the next record to fetch
+        self.first = 0
+        self.next = 0
+        self.exhausted = False
+
+    # Next record to fetch, None at the end of the trace; records before committed have retired
+    def fetch(self, committed):
+        while self.first < committed:
+            self.window.popleft()
+            self.first += 1
+        if self.next - self.first < len(self.window):
+            record = self.window[self.next - self.first]
+        else:
+            record = next(self.records, None)
+            if record is None:
+                self.exhausted = True
+                return None
+            self.window.append(record)
+        self.next += 1
+        return record
+
+    def pending(self):
+        return not self.exhausted or self.next - self.first < len(self.window)
+
+    # Fetch again from the record with this sequence number
+    def replayFrom(self, sequence):
+        self.next = sequence
+
+
+# The out-of-order core fed from a trace instead of the program. Only timing is modelled: the trace gives every
+# address and branch outcome. A mispredicted branch lets fetch run on down the trace in place of the wrong path until
+# it resolves; what was fetched after it is then squashed and fetched again.
+class TraceProcessor(Processor):
+    timingOnly = True
+
+    def __init__(self, config, trace):
+        Processor.__init__(self, config, SparseMemory(), trace)
+
+    def fetch(self, instructionFile):
+        traceStage = self.traceLevel >= TRACE_STAGE
+        if traceStage:
+            logging.info(f"[{self.cycle}]: STATE: FETCH")
+        # Fetch stalls while the decode queue is full, which bounds the trace window by the queues and the ROB
+        for i in range(self.DecodeQueue.space()):
+            record = instructionFile.fetch(self.counters.instructions)
+            if record is None:
+                break
+            if traceStage:
+                logging.info(f"[{self.cycle}]::Fetch:[{record.pc}]:: {record}")
+            self.DecodeQueue.append(record)
+            if self.timeline is not None:
+                self.timeline.fetch(record.pc, record.instruction, self.cycle)
+        if traceStage:
+            logging.info("")
+        return self.DecodeQueue
+
+    # Records come in the order they ran, so fetch is already on the taken path
+    def redirectFetch(self):
+        pass
+
+    def fetchPending(self):
+        return self.instructionFile.pending()
+
+    # Fetch resumes with the record after robEntry: the committed ones, then those of robEntry and the older entries
+    def flushAfter(self, robEntry):
+        squashed = Processor.flushAfter(self, robEntry)
+        self.instructionFile.replayFrom(self.counters.instructions + self.ROB.distance(robEntry) + 1)
+        return squashed
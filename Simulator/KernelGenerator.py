@@ -0,0 +1,121 @@
+import random
+
+KERNEL_OPS = ["add", "addi", "fadd", "fsub", "fmul", "fdiv", "fld", "fsd"]
+BRANCH_PATTERNS = ["none", "taken", "never", "alternate", "random"]
+
+# Named kernels of the benchmark suite, as generateKernel arguments
+KERNEL_PRESETS = {
+    "chain": {"depth": 16, "mix": "fadd:2,fmul:1"},
+    "parallel": {"depth": 1, "mix": "fadd:2,fmul:1,add:1"},
+    "mixed": {"depth": 4, "mix": "add:1,addi:1,fadd:2,fmul:2,fdiv:1,fld:2,fsd:1"},
+    "memory": {"depth": 2, "mix": "fld:3,fadd:1,fsd:2", "footprint": 65536},
+    "branchy": {"depth": 4, "mix": "fadd:2,fmul:1,add:1", "branch": "random"},
+}
+
+
+# "fadd:2,fld:1" -> {"fadd": 2, "fld": 1}
+def parseMix(text):
+    mix = {}
+    for item in text.split(","):
+        op, _, weight = item.strip().partition(":")
+        if op not in KERNEL_OPS:
+            raise ValueError(f"unknown op '{op}' in the op mix, expected one of {', '.join(KERNEL_OPS)}")
+        mix[op] = float(weight) if weight else 1.0
+    if sum(mix.values()) <= 0:
+        raise ValueError("the op mix has no positive weight")
+    return mix
+
+
+# Synthetic loop kernel: program lines and the memory words it needs.
+#   body       instructions per iteration, not counting the loop overhead and the branch
+#   depth      length of each dependency chain; the body interleaves body / depth independent chains, each
+#              started afresh every iteration. A load goes to the scratch register F30 and an fadd folds it into
+#              its chain, so loads extend chains like any other op.
+#   mix        op weights the body's instructions are drawn from
+#   trips      loop iterations, rounded down to whole passes over the footprint
+#   branch     outcome pattern of a branch in the body skipping one instruction, read from memory every iteration
+#   footprint  bytes each load/store walks through, 8 bytes per iteration, at most trips * 8; every memory op has
+#              its own array
+def generateKernel(body=16, depth=4, mix="fadd:2,fmul:1,add:1,fld:1,fsd:1", trips=1000, branch="none",
+                   footprint=4096, seed=1):
+    if branch not in BRANCH_PATTERNS:
+        raise ValueError(f"unknown branch pattern '{branch}', expected one of {', '.join(BRANCH_PATTERNS)}")
+    if footprint < 8 or footprint % 8:
+        raise ValueError(f"footprint {footprint} is not a positive multiple of 8 bytes")
+    if body < 1 or depth < 1 or trips < 1:
+        raise ValueError("body, depth and trips must be at least 1")
+    mix = parseMix(mix) if isinstance(mix, str) else mix
+    rng = random.Random(seed)
+    ops = rng.choices(list(mix), weights=list(mix.values()), k=body)
+    chains = (body + depth - 1) // depth
+    # A pass walks min(trips, footprint / 8) words, the bytes each array spans
+    words = min(trips, footprint // 8)
+    passes = trips // words
+    span = words * 8
+    memoryOps = sum(op in ["fld", "fsd"] for op in ops)
+    patternBase = max(memoryOps, 1) * span
+
+    # F0 holds 1.0 from address 0, R1 walks the arrays down from span to 8, R9 counts the passes
+    lines = ["fld F0, 0(R0)", f"addi R9, R0, {passes}", f"outer: addi R1, R0, {span}"]
+    started = set()
+    memoryOp = 0
+    skipAt = body // 2 if branch != "none" and body > 1 else None
+    for i, op in enumerate(ops):
+        chain = i % chains
+        register = f"F{chain + 1}"
+        # The first instruction of a chain in an iteration reads F0 instead of the chain register
+        source = register if chain in started else "F0"
+        started.add(chain)
+        if op == "fld":
+            offset = memoryOp * span
+            memoryOp += 1
+            text = [f"fld F30, {offset}(R1)", f"fadd {register}, {source}, F30"]
+        elif op == "fsd":
+            offset = memoryOp * span
+            memoryOp += 1
+            text = [f"fsd {source}, {offset}(R1)"]
+        elif op == "addi":
+            text = [f"addi {register}, {source}, 1"]
+        else:
+            text = [f"{op} {register}, {source}, F0"]
+        if i == skipAt:
+            lines.append(f"fld F31, {patternBase}(R1)")
+            lines.append("bne F31, R0, skip")
+        elif skipAt is not None and i == skipAt + 1:
+            text[0] = f"skip: {text[0]}"
+        elif i == 0:
+            text[0] = f"loop: {text[0]}"
+        lines += text
+    if skipAt is not None and skipAt == body - 1:
+        lines.append("skip: addi R1, R1, -8")
+    else:
+        lines.append("addi R1, R1, -8")
+    lines += ["bne R1, R0, loop", "addi R9, R9, -1", "bne R9, R0, outer"]
+
+    memory = {0: 1}
+    for array in range(memoryOp):
+        for word in range(1, words + 1):
+            memory[array * span + word * 8] = word % 100 + 1
+    if branch != "none":
+        for word in range(1, words + 1):
+            if branch == "taken":
+                taken = True
+            elif branch == "never":
+                taken = False
+            elif branch == "alternate":
+                taken = word % 2 == 0
+            else:
+                taken = rng.random() < 0.5
+            if taken:
+                memory[patternBase + word * 8] = 1
+    return lines, memory
+
+
+# Write a kernel as a program file and a text memory file
+def writeKernel(programFile, memoryFile, **parameters):
+    lines, memory = generateKernel(**parameters)
+    with open(programFile, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    with open(memoryFile, "w") as f:
+        for address in sorted(memory):
+            f.write(f"{address}, {memory[address]}\n")
@@ -0,0 +1,176 @@
+from Simulator.BranchPredictor import checkPowerOfTwo
+
+MEMORY_DEPENDENCE_PREDICTORS = ["none", "wait-table"]
+
+
+# A load or store between issue and commit; its address is known as soon as the base register is available
+class MemoryOperation:
+    def __init__(self, instId, pc, stationEntry, offset):
+        self.instId = instId
+        self.pc = pc
+        # RS entry holding the operands, dropped once the operation starts executing
+        self.stationEntry = stationEntry
+        self.offset = offset
+        self.address = None
+        # Stores: value to be written, known once the data register is available
+        self.dataReady = False
+        self.data = None
+        # Loads: set once the value is read, with the id of the store it was forwarded from, if any
+        self.performed = False
+        self.forwardedFrom = None
+        # Load read its value before an older store to the same address was disambiguated
+        self.violated = False
+
+
+# Load-wait table: one bit per load address, set when that load was caught bypassing a store it depended on
+class LoadWaitTable:
+    name = "wait-table"
+
+    def __init__(self, entries):
+        checkPowerOfTwo("Load wait table entries", entries)
+        self.mask = entries - 1
+        self.table = [False] * entries
+
+    def index(self, pc):
+        return (pc >> 2) & self.mask
+
+    def shouldWait(self, pc):
+        return self.table[self.index(pc)]
+
+    def violation(self, pc):
+        self.table[self.index(pc)] = True
+
+
+def createDependencePredictor(name, entries):
+    if name == "none":
+        return None
+    if name == "wait-table":
+        return LoadWaitTable(entries)
+    raise ValueError(f"Unknown memory dependence predictor '{name}', expected one of "
+                     f"{', '.join(MEMORY_DEPENDENCE_PREDICTORS)}")
+
+
+# Loads and stores in program order from issue to commit. A ready load forwards from the youngest older store to
+# its address and bypasses older stores to other addresses. Older stores with an unknown address hold it back,
+# unless the dependence predictor lets it speculate; a store that then resolves to its address marks it violated.
+class LoadStoreQueue:
+    def __init__(self, loadEntries, storeEntries, predictor=None):
+        self.loadEntries = loadEntries
+        self.storeEntries = storeEntries
+        self.predictor = predictor
+        # Port to a shared main memory, loads not forwarded from a store need it to read their value
+        self.memoryPort = None
+        # Instruction id -> MemoryOperation, in program order
+        self.loads = {}
+        self.stores = {}
+        self.forwards = 0
+        self.orderingStalls = 0
+        self.violations = 0
+
+    def predictorName(self):
+        return self.predictor.name if self.predictor is not None else "none"
+
+    def isAvailable(self, op):
+        if op == "fld":
+            return len(self.loads) < self.loadEntries
+        if op == "fsd":
+            return len(self.stores) < self.storeEntries
+        return True
+
+    def insert(self, instruction, stationEntry):
+        if instruction.op == "fld":
+            self.loads[instruction.instructionId] = MemoryOperation(instruction.instructionId, instruction.pc,
+                                                                    stationEntry, instruction.s1)
+        elif instruction.op == "fsd":
+            self.stores[instruction.instructionId] = MemoryOperation(instruction.instructionId, instruction.pc,
+                                                                     stationEntry, instruction.d)
+
+    # Record the addresses and store data whose registers became available
+    def resolve(self, registerFile):
+        for store in self.stores.values():
+            entry = store.stationEntry
+            if entry is None:
+                continue
+            if store.address is None and entry.qk is None:
+                store.address = self.effectiveAddress(store, registerFile)
+                self.checkViolations(store)
+            if not store.dataReady and entry.qj is None:
+                store.dataReady = True
+                store.data = registerFile.values[entry.vj]
+        for load in self.loads.values():
+            entry = load.stationEntry
+            if entry is not None and load.address is None and entry.qk is None:
+                load.address = self.effectiveAddress(load, registerFile)
+
+    # Offset plus base register, unless a trace already recorded the address
+    def effectiveAddress(self, operation, registerFile):
+        entry = operation.stationEntry
+        if entry.address is not None:
+            return entry.address
+        return int(operation.offset) + int(registerFile.values[entry.vk])
+
+    # Younger loads that already read the store's address from an older source read stale data
+    def checkViolations(self, store):
+        for load in self.loads.values():
+            if load.instId < store.instId or not load.performed or load.violated or load.address != store.address:
+                continue
+            if load.forwardedFrom is None or load.forwardedFrom < store.instId:
+                load.violated = True
+                if self.predictor is not None:
+                    self.predictor.violation(load.pc)
+
+    # Whether a ready load may read its value now, setting up forwarding into its RS entry when it can
+    def issueLoad(self, entry):
+        load = self.loads[entry.instId]
+        speculate = self.predictor is not None and not self.predictor.shouldWait(load.pc)
+        for store in reversed(list(self.stores.values())):
+            if store.instId > load.instId:
+                continue
+            if store.address is None:
+                if speculate:
+                    continue
+                self.orderingStalls += 1
+                return False
+            if store.address == load.address:
+                if not store.dataReady:
+                    self.orderingStalls += 1
+                    return False
+                entry.forwarded = True
+                entry.forwardedValue = store.data
+                load.forwardedFrom = store.instId
+                self.forwards += 1
+                break
+        if load.forwardedFrom is None and self.memoryPort is not None and not self.memoryPort.acquire():
+            return False
+        load.performed = True
+        return True
+
+    # Whether a ready RS entry may start executing; everything but loads always can
+    def canExecute(self, entry):
+        if entry.op == "fld":
+            return self.issueLoad(entry)
+        return True
+
+    # The RS entry is about to be recycled, everything needed from it has been recorded
+    def started(self, entry):
+        operation = self.loads.get(entry.instId) or self.stores.get(entry.instId)
+        if operation is not None:
+            operation.stationEntry = None
+
+    # Remove a committing load or store, returning it
+    def commit(self, instId, op):
+        if op == "fld":
+            load = self.loads.pop(instId)
+            if load.violated:
+                self.violations += 1
+            return load
+        return self.stores.pop(instId)
+
+    # Drop the loads and stores younger than instId, the last ones in program order
+    def flushAfter(self, instId):
+        for operations in [self.loads, self.stores]:
+            while operations:
+                operationId, operation = operations.popitem()
+                if operationId <= instId:
+                    operations[operationId] = operation
+                    break
@@ -0,0 +1,93 @@
+import json
+
+OPERATIONS = ["add", "addi", "fld", "fsd", "fadd", "fsub", "fmul", "fdiv", "bne"]
+
+# Functional units and reservation stations of the original design, used when no machine file is given
+DEFAULT_MACHINE = {
+    "units": {
+        "INT": {"latency": 1, "pipelined": False},
+        "LoadStore": {"latency": 1, "pipelined": False},
+        "FPadd": {"latency": 3, "pipelined": False},
+        "FPmult": {"latency": 4, "pipelined": False},
+        "FPdiv": {"latency": 8, "pipelined": False},
+        "BU": {"latency": 1, "pipelined": False},
+    },
+    "stations": [
+        {"name": "INT", "entries": 4, "unit": "INT", "ops": ["add", "addi"]},
+        {"name": "Load", "entries": 2, "unit": "LoadStore", "ops": ["fld"]},
+        {"name": "Store", "entries": 2, "unit": "LoadStore", "ops": ["fsd"]},
+        {"name": "FPadd", "entries": 3, "unit": "FPadd", "ops": ["fadd", "fsub"]},
+        {"name": "FPmult", "entries": 4, "unit": "FPmult", "ops": ["fmul"]},
+        {"name": "FPdiv", "entries": 2, "unit": "FPdiv", "ops": ["fdiv"]},
+        {"name": "BU", "entries": 1, "unit": "BU", "ops": ["bne"]},
+    ],
+}
+
+
+def isPositiveInteger(value):
+    return isinstance(value, int) and not isinstance(value, bool) and value > 0
+
+
+# Check a machine description and fill in optional fields, raises ValueError naming the first problem
+def validateMachine(machine):
+    units = machine.get("units")
+    stations = machine.get("stations")
+    if not isinstance(units, dict) or not units:
+        raise ValueError("Machine description needs a non-empty 'units' object")
+    if not isinstance(stations, list) or not stations:
+        raise ValueError("Machine description needs a non-empty 'stations' list")
+    for name, unit in units.items():
+        if not isPositiveInteger(unit.get("latency")):
+            raise ValueError(f"Unit '{name}': latency must be a positive integer")
+        unit.setdefault("pipelined", False)
+        if not isinstance(unit["pipelined"], bool):
+            raise ValueError(f"Unit '{name}': pipelined must be true or false")
+        # A pipelined unit starts an operation every interval cycles, by default every cycle
+        if unit["pipelined"]:
+            unit.setdefault("interval", 1)
+            if not isPositiveInteger(unit["interval"]) or unit["interval"] > unit["latency"]:
+                raise ValueError(f"Unit '{name}': interval must be a positive integer no larger than the latency")
+        elif "interval" in unit:
+            raise ValueError(f"Unit '{name}': only a pipelined unit has an interval")
+        unit.setdefault("count", 1)
+        if not isPositiveInteger(unit["count"]):
+            raise ValueError(f"Unit '{name}': count must be a positive integer")
+    routed = {}
+    names = set()
+    stationsOfUnit = {}
+    for station in stations:
+        name = station.get("name")
+        if name in names:
+            raise ValueError(f"Station '{name}' is declared twice")
+        names.add(name)
+        if not isPositiveInteger(station.get("entries")):
+            raise ValueError(f"Station '{name}': entries must be a positive integer")
+        if station.get("unit") not in units:
+            raise ValueError(f"Station '{name}': unknown unit '{station.get('unit')}'")
+        stationsOfUnit.setdefault(station["unit"], []).append(station)
+        for op in station.get("ops", []):
+            if op not in OPERATIONS:
+                raise ValueError(f"Station '{name}': unknown op '{op}'")
+            if op in routed:
+                raise ValueError(f"Op '{op}' is routed to both '{routed[op]}' and '{name}'")
+            routed[op] = name
+    missing = [op for op in OPERATIONS if op not in routed]
+    if missing:
+        raise ValueError(f"No station executes {', '.join(missing)}")
+    # Only loads and stores have an arbitration policy for a shared unit
+    for unit, users in stationsOfUnit.items():
+        if len(users) > 1 and sorted(op for station in users for op in station["ops"]) != ["fld", "fsd"]:
+            raise ValueError(f"Unit '{unit}' can only be shared by the fld and fsd stations")
+    return machine
+
+
+def readMachineFile(fileName):
+    with open(fileName, "r") as f:
+        try:
+            machine = json.load(f)
+        except json.JSONDecodeError as error:
+            raise ValueError(f"{fileName}: {error}")
+    try:
+        return validateMachine(machine)
+    except ValueError as error:
+        raise ValueError(f"{fileName}: {error}")
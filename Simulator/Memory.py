@@ -0,0 +1,242 @@
+import ast
+import mmap
+import os
+import struct
+
+PAGE_SIZE = 1024
+WORD_SIZE = 8
+NPY_MAGIC = b"\x93NUMPY"
+# Binary images hold one little-endian 8-byte word per 8-byte aligned address, so element i of an array is at address
+# 8 * i as fld and fsd step through it; raw images are doubles
+WORD_FORMATS = {"<f8": struct.Struct("<d"), "<i8": struct.Struct("<q")}
+
+
+# Byte-addressed main memory kept in fixed-size pages allocated on first write; unwritten addresses read as 0
+class SparseMemory:
+    def __init__(self, pageSize=PAGE_SIZE):
+        self.pageSize = pageSize
+        self.pages = {}
+        # One past the highest address written, the length of the equivalent flat list
+        self.size = 0
+
+    def __getitem__(self, address):
+        page = self.pages.get(address // self.pageSize)
+        if page is None:
+            return 0
+        return page[address % self.pageSize]
+
+    def __setitem__(self, address, value):
+        if address < 0:
+            raise IndexError(f"Store to negative memory address {address}")
+        number, offset = divmod(address, self.pageSize)
+        page = self.pages.get(number)
+        if page is None:
+            page = self.pages[number] = [0] * self.pageSize
+        page[offset] = value
+        if address >= self.size:
+            self.size = address + 1
+
+    def __len__(self):
+        return self.size
+
+    def __eq__(self, other):
+        return list(self.items()) == list(other.items())
+
+    # Non-zero words in address order
+    def items(self):
+        for number in sorted(self.pages):
+            base = number * self.pageSize
+            for offset, value in enumerate(self.pages[number]):
+                if value != 0:
+                    yield base + offset, value
+
+    # Every step-th address of the allocated pages below len(), zeros included, in address order
+    def words(self, step=8):
+        for number in sorted(self.pages):
+            base = number * self.pageSize
+            page = self.pages[number]
+            for offset in range(0, min(self.pageSize, self.size - base), step):
+                yield base + offset, page[offset]
+
+    # Feed the contents to a hashlib hash
+    def digest(self, hash):
+        hash.update(repr((self.pageSize, self.size)).encode())
+        for number in sorted(self.pages):
+            hash.update(repr((number, self.pages[number])).encode())
+
+    def copy(self):
+        memory = SparseMemory(self.pageSize)
+        memory.pages = {number: list(page) for number, page in self.pages.items()}
+        memory.size = self.size
+        return memory
+
+
+# Copy-on-write view of a memory: reads fall through to the base, which writes never touch, so a short run on it
+# costs the words it stores instead of a copy of the whole memory
+class OverlayMemory:
+    def __init__(self, base):
+        self.base = base
+        self.writes = {}
+
+    def __getitem__(self, address):
+        if address in self.writes:
+            return self.writes[address]
+        return self.base[address]
+
+    def __setitem__(self, address, value):
+        if address < 0:
+            raise IndexError(f"Store to negative memory address {address}")
+        self.writes[address] = value
+
+
+def readTextMemory(fileName):
+    memory = SparseMemory()
+    with open(fileName, "r") as f:
+        for line in f:
+            if line.strip():
+                address, value = line.split(",")
+                memory[int(address.strip())] = int(value.strip())
+    return memory
+
+
+# Binary image (raw words or .npy) mapped copy-on-write, so the source file is never modified and loads without parsing.
+# Word i is at address 8 * i, the byte offset of the word in the image; addresses in between are rejected.
+class ImageMemory:
+    def __init__(self, data, dtype="<f8"):
+        self.data = data
+        self.dtype = dtype
+        self.word = WORD_FORMATS[dtype]
+        self.count = len(data) // WORD_SIZE
+        # Addresses past the end of the image
+        self.overflow = SparseMemory()
+
+    @staticmethod
+    def open(fileName):
+        with open(fileName, "rb") as f:
+            dtype, offset = readNpyHeader(f, fileName) if fileName.endswith(".npy") else ("<f8", 0)
+            size = os.fstat(f.fileno()).st_size - offset
+            if size % WORD_SIZE:
+                raise ValueError(f"{fileName}: image size is not a whole number of {WORD_SIZE}-byte words")
+            if size == 0:
+                return ImageMemory(bytearray(), dtype)
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        return ImageMemory(memoryview(data)[offset:], dtype)
+
+    def isMapped(self, address):
+        if address % WORD_SIZE:
+            raise ValueError(f"Memory address {address} is not a multiple of {WORD_SIZE}, image words are "
+                             f"{WORD_SIZE}-byte aligned")
+        return 0 <= address < self.count * WORD_SIZE
+
+    def __getitem__(self, address):
+        if self.isMapped(address):
+            return self.word.unpack_from(self.data, address)[0]
+        return self.overflow[address]
+
+    def __setitem__(self, address, value):
+        if self.isMapped(address):
+            if self.dtype == "<i8" and value != int(value):
+                raise ValueError(f"Cannot store {value} at {address} in an integer memory image")
+            self.word.pack_into(self.data, address, int(value) if self.dtype == "<i8" else float(value))
+        else:
+            self.overflow[address] = value
+
+    def __len__(self):
+        return max(self.count * WORD_SIZE, len(self.overflow))
+
+    def __eq__(self, other):
+        return list(self.items()) == list(other.items())
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["data"] = bytes(self.data)
+        del state["word"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.data = bytearray(self.data)
+        self.word = WORD_FORMATS[self.dtype]
+
+    def items(self):
+        words = []
+        for i, value in enumerate(self.word.iter_unpack(self.data)):
+            if value[0] != 0:
+                words.append((i * WORD_SIZE, value[0]))
+        words.extend(self.overflow.items())
+        return sorted(words)
+
+    def words(self, step=8):
+        for address in range(0, self.count * WORD_SIZE, step):
+            yield address, self[address]
+        for address, value in self.overflow.words(step):
+            if not self.isMapped(address):
+                yield address, value
+
+    # Feed the contents to a hashlib hash, the image as its raw bytes
+    def digest(self, hash):
+        hash.update(self.dtype.encode())
+        hash.update(self.data)
+        self.overflow.digest(hash)
+
+    def copy(self):
+        memory = ImageMemory(bytearray(self.data), self.dtype)
+        memory.overflow = self.overflow.copy()
+        return memory
+
+
+def readNpyHeader(f, fileName):
+    if f.read(len(NPY_MAGIC)) != NPY_MAGIC:
+        raise ValueError(f"{fileName} is not a .npy file")
+    major, minor = f.read(2)
+    if major == 1:
+        headerLength, = struct.unpack("<H", f.read(2))
+    else:
+        headerLength, = struct.unpack("<I", f.read(4))
+    header = ast.literal_eval(f.read(headerLength).decode("latin1"))
+    if header["descr"] not in WORD_FORMATS or header["fortran_order"] or len(header["shape"]) != 1:
+        raise ValueError(f"{fileName}: expected a 1-D array of little-endian 8-byte words (<f8 or <i8)")
+    return header["descr"], f.tell()
+
+
+def npyHeader(dtype, count):
+    header = f"{{'descr': '{dtype}', 'fortran_order': False, 'shape': ({count},), }}"
+    # Version 1.0 header, padded with spaces so the data starts on a 64-byte boundary
+    padding = 64 - (len(NPY_MAGIC) + 4 + len(header) + 1) % 64
+    header += " " * (padding % 64) + "\n"
+    return NPY_MAGIC + bytes([1, 0]) + struct.pack("<H", len(header)) + header.encode("latin1")
+
+
+def isImageFile(fileName):
+    return fileName.endswith((".npy", ".bin", ".raw"))
+
+
+# Text "address, value" files load sparsely; .npy and raw .bin/.raw word images are memory-mapped
+def loadMemory(fileName):
+    if isImageFile(fileName):
+        return ImageMemory.open(fileName)
+    return readTextMemory(fileName)
+
+
+# Write memory in the format given by the file extension, so the loaded format round-trips
+def saveMemory(memory, fileName):
+    if not isImageFile(fileName):
+        with open(fileName, "w") as f:
+            for address, value in memory.items():
+                f.write(f"{address}, {value}\n")
+        return
+    # Raw images carry no type, they are always doubles; .npy keeps integer words when every value is one
+    if not fileName.endswith(".npy"):
+        dtype = "<f8"
+    elif isinstance(memory, ImageMemory):
+        dtype = memory.dtype
+    else:
+        dtype = "<i8" if all(isinstance(value, int) for address, value in memory.items()) else "<f8"
+    # Written from a copy, the file may be the one this memory is mapped from; a misaligned address raises
+    image = ImageMemory(bytearray((len(memory) + WORD_SIZE - 1) // WORD_SIZE * WORD_SIZE), dtype)
+    for address, value in memory.items():
+        image[address] = value
+    with open(fileName, "wb") as f:
+        if fileName.endswith(".npy"):
+            f.write(npyHeader(dtype, image.count))
+        f.write(image.data)
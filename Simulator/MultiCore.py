@@ -0,0 +1,233 @@
+import multiprocessing
+import threading
+from multiprocessing.sharedctypes import RawArray
+from Simulator.Processor import Processor
+from Simulator.SimulationResult import MultiCoreResult
+
+
+# Main memory as one core sees it. Stores commit into the core's own pending writes, which it reads back at once;
+# the other cores only see them once the quantum ends and every core's stores are applied to the shared memory.
+class CoreMemory:
+    def __init__(self, shared, coreId):
+        self.shared = shared
+        self.coreId = coreId
+        # Cycle of the step being simulated, which stamps the stores committed in it
+        self.cycle = 0
+        self.pending = {}
+        # (cycle, address, value) of this quantum's stores, in commit order
+        self.log = []
+
+    def __getitem__(self, address):
+        if address in self.pending:
+            return self.pending[address]
+        return self.shared[address]
+
+    def __setitem__(self, address, value):
+        self.pending[address] = value
+        self.log.append((self.cycle, address, value))
+
+    # The quantum's stores were applied to the shared memory
+    def endQuantum(self):
+        self.pending = {}
+        self.log = []
+
+
+# Shared memory ports handed out round robin: in cycle c, port k belongs to core (c * ports + k) % cores, so with
+# fewer ports than cores each core gets a port in ports out of every cores cycles. None gives every core its own.
+class MemoryPort:
+    def __init__(self, processor, coreId, cores, ports=None):
+        self.processor = processor
+        self.coreId = coreId
+        self.cores = cores
+        self.ports = ports
+        self.usedCycle = None
+        self.used = 0
+        # Accesses refused for want of a port
+        self.stalls = 0
+
+    # Ports this core owns in a cycle
+    def owned(self, cycle):
+        first = cycle * self.ports - self.coreId - 1
+        return (first + self.ports) // self.cores - first // self.cores
+
+    # Take one of this cycle's ports, False if none is left
+    def acquire(self):
+        if self.ports is None:
+            return True
+        cycle = self.processor.cycle
+        if cycle != self.usedCycle:
+            self.usedCycle = cycle
+            self.used = 0
+        if self.used < self.owned(cycle):
+            self.used += 1
+            return True
+        self.stalls += 1
+        return False
+
+
+# Stores of every core in the order they become visible: by cycle, then by core
+def orderStores(logs):
+    stores = []
+    for coreId, log in logs:
+        for i, (cycle, address, value) in enumerate(log):
+            stores.append((cycle, coreId, i, address, value))
+    stores.sort()
+    return stores
+
+
+def applyStores(memory, logs):
+    for cycle, coreId, i, address, value in orderStores(logs):
+        memory[address] = value
+
+
+# Run a core up to the end of the quantum, the cycle before boundary
+def runQuantum(core, memory, boundary):
+    while not core.finished and core.cycle < boundary:
+        memory.cycle = core.cycle
+        core.step()
+
+
+def finishCore(core):
+    core.counters.closeInterval(core.cycle - 1)
+    result = core.getResult()
+    # Memory is reported once for all cores
+    result.memory = None
+    result.portStalls = core.memoryPort.stalls
+    return result
+
+
+# Quantum store logs of every core in shared-memory arrays, written by the worker running each core
+class StoreBuffers:
+    def __init__(self, cores, capacity):
+        self.capacity = capacity
+        self.counts = RawArray("q", cores)
+        self.finished = RawArray("b", cores)
+        self.cycles = RawArray("q", cores * capacity)
+        self.addresses = RawArray("q", cores * capacity)
+        self.values = RawArray("d", cores * capacity)
+        # Integer values are kept as such, the others are doubles
+        self.isInteger = RawArray("b", cores * capacity)
+
+    def write(self, coreId, log, finished):
+        if len(log) > self.capacity:
+            raise ValueError(f"Core {coreId} committed {len(log)} stores in a quantum, more than {self.capacity}")
+        base = coreId * self.capacity
+        for i, (cycle, address, value) in enumerate(log):
+            self.cycles[base + i] = cycle
+            self.addresses[base + i] = address
+            self.isInteger[base + i] = isinstance(value, int)
+            self.values[base + i] = value
+        self.counts[coreId] = len(log)
+        self.finished[coreId] = finished
+
+    def read(self):
+        logs = []
+        for coreId in range(len(self.counts)):
+            base = coreId * self.capacity
+            log = []
+            for i in range(base, base + self.counts[coreId]):
+                value = int(self.values[i]) if self.isInteger[i] else self.values[i]
+                log.append((self.cycles[i], self.addresses[i], value))
+            logs.append((coreId, log))
+        return logs
+
+    def allFinished(self):
+        return all(self.finished)
+
+
+# Worker process: runs its cores quantum by quantum in lock step with the other workers over a replica of memory
+def runWorker(coreIds, cores, memory, quantum, buffers, barrier, results):
+    try:
+        boundary = 0
+        while True:
+            boundary += quantum
+            for coreId, core in zip(coreIds, cores):
+                runQuantum(core, core.MainMemory, boundary)
+                buffers.write(coreId, core.MainMemory.log, core.finished)
+            barrier.wait()
+            finished = buffers.allFinished()
+            applyStores(memory, buffers.read())
+            for core in cores:
+                core.MainMemory.endQuantum()
+            barrier.wait()
+            if finished:
+                break
+        results.put([(coreId, finishCore(core)) for coreId, core in zip(coreIds, cores)])
+    except BaseException as error:
+        barrier.abort()
+        results.put(error)
+
+
+# N cores, each with its own program and registers, over one shared main memory. Cores advance in lock-stepped
+# quanta; the stores each core commits in a quantum become visible to the others when it ends, in (cycle, core)
+# order. With workers > 0 the cores are spread over that many processes, with the same results.
+class MultiCoreSimulation:
+    def __init__(self, config, MainMemory, programs, programNames=None):
+        self.config = dict(config, traceLevel="none", pipelineTrace=None, memoryOut=None, checkpointEvery=None,
+                           checkpointPC=None, eventDriven=False)
+        self.MainMemory = MainMemory
+        self.programNames = programNames or [None] * len(programs)
+        self.quantum = config.get('quantum', 1)
+        self.memoryPorts = config.get('memoryPorts')
+        self.workers = config.get('workers', 0)
+        self.cores = []
+        for coreId, program in enumerate(programs):
+            core = Processor(self.config, CoreMemory(MainMemory, coreId), program)
+            core.attachMemoryPort(MemoryPort(core, coreId, len(programs), self.memoryPorts))
+            self.cores.append(core)
+
+    def run(self):
+        if self.workers:
+            results = self.runParallel()
+        else:
+            results = self.runSerial()
+        return MultiCoreResult(self.config, self.programNames, results, self.MainMemory)
+
+    def runSerial(self):
+        boundary = 0
+        while not all(core.finished for core in self.cores):
+            boundary += self.quantum
+            for core in self.cores:
+                runQuantum(core, core.MainMemory, boundary)
+            applyStores(self.MainMemory, [(core.MainMemory.coreId, core.MainMemory.log) for core in self.cores])
+            for core in self.cores:
+                core.MainMemory.endQuantum()
+        return [finishCore(core) for core in self.cores]
+
+    def runParallel(self):
+        workers = min(self.workers, len(self.cores))
+        # A core commits at most NR stores a cycle
+        buffers = StoreBuffers(len(self.cores), self.quantum * self.config['NR'])
+        barrier = multiprocessing.Barrier(workers + 1)
+        results = multiprocessing.Queue()
+        processes = []
+        for worker in range(workers):
+            coreIds = list(range(worker, len(self.cores), workers))
+            cores = [self.cores[coreId] for coreId in coreIds]
+            process = multiprocessing.Process(target=runWorker, args=(coreIds, cores, self.MainMemory, self.quantum,
+                                                                     buffers, barrier, results), daemon=True)
+            process.start()
+            processes.append(process)
+        try:
+            while True:
+                barrier.wait()
+                finished = buffers.allFinished()
+                applyStores(self.MainMemory, buffers.read())
+                barrier.wait()
+                if finished:
+                    break
+            workerResults = [results.get() for worker in range(workers)]
+        except threading.BrokenBarrierError:
+            # The failed worker broke the barrier and sent its error
+            workerResults = [results.get(timeout=10)]
+        finally:
+            for process in processes:
+                process.join(1)
+                if process.is_alive():
+                    process.terminate()
+        coreResults = {}
+        for workerResult in workerResults:
+            if isinstance(workerResult, BaseException):
+                raise RuntimeError(f"Multi-core worker process failed: {workerResult!r}") from workerResult
+            coreResults.update(workerResult)
+        return [coreResults[coreId] for coreId in range(len(self.cores))]
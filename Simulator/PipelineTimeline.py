@@ -0,0 +1,151 @@
+import collections
+import heapq
+import json
+
+# Stages a dynamic instruction goes through from fetch until it commits or is flushed, with their Konata names
+TIMELINE_STAGES = {"fetch": "F", "decode": "Dc", "issue": "Is", "execute": "Ex", "complete": "Cp", "writeBack": "Wb"}
+
+
+# Konata pipeline log (Kanata 0004): one row per instruction, written as the simulation runs
+class KonataWriter:
+    def __init__(self, fileName):
+        self.file = open(fileName, "w")
+        self.file.write("Kanata\t0004\nC=\t0\n")
+        self.cycle = 0
+        self.retired = 0
+
+    def advance(self, cycle):
+        if cycle > self.cycle:
+            self.file.write(f"C\t{cycle - self.cycle}\n")
+            self.cycle = cycle
+
+    def begin(self, id, pc, instruction, cycle):
+        self.advance(cycle)
+        self.file.write(f"I\t{id}\t{id}\t0\nL\t{id}\t0\t{pc}: {instruction}\n")
+
+    def stage(self, id, previous, previousStart, stage, cycle):
+        self.advance(cycle)
+        if previous is not None:
+            self.file.write(f"E\t{id}\t0\t{TIMELINE_STAGES[previous]}\n")
+        self.file.write(f"S\t{id}\t0\t{TIMELINE_STAGES[stage]}\n")
+
+    def end(self, id, pc, instruction, stage, stageStart, beginCycle, cycle, flushed):
+        self.advance(cycle)
+        self.file.write(f"E\t{id}\t0\t{TIMELINE_STAGES[stage]}\n")
+        if flushed:
+            self.file.write(f"R\t{id}\t0\t1\n")
+        else:
+            self.file.write(f"R\t{id}\t{self.retired}\t0\n")
+            self.retired += 1
+
+    def close(self):
+        self.file.close()
+
+
+# Chrome trace-event JSON, one microsecond per cycle. Each instruction is a slice holding one slice per stage, on the
+# lowest lane (thread) free when it was fetched, so lanes are reused and their number stays that of the instructions
+# in flight. Events are written as each stage ends; the array is closed at the end of the run.
+class ChromeTraceWriter:
+    def __init__(self, fileName):
+        self.file = open(fileName, "w")
+        self.file.write('[\n{"name": "process_name", "ph": "M", "pid": 0, "args": {"name": "pipeline"}}')
+        self.lanes = {}
+        self.freeLanes = []
+        self.laneCount = 0
+
+    # Formatted directly, json.dumps on every event would dominate a timeline run
+    def slice(self, id, name, start, end, args=""):
+        self.file.write(f',\n{{"name": {json.dumps(name)}, "ph": "X", "pid": 0, "tid": {self.lanes[id]}, '
+                        f'"ts": {start}, "dur": {end - start}, "args": {{"id": {id}{args}}}}}')
+
+    def begin(self, id, pc, instruction, cycle):
+        if self.freeLanes:
+            self.lanes[id] = heapq.heappop(self.freeLanes)
+        else:
+            self.lanes[id] = self.laneCount
+            self.laneCount += 1
+
+    def stage(self, id, previous, previousStart, stage, cycle):
+        if previous is not None and cycle > previousStart:
+            self.slice(id, previous, previousStart, cycle)
+
+    def end(self, id, pc, instruction, stage, stageStart, beginCycle, cycle, flushed):
+        self.slice(id, stage, stageStart, cycle + 1)
+        self.slice(id, f"{pc}: {instruction}", beginCycle, cycle + 1,
+                   f', "pc": {pc}, "result": "{"flush" if flushed else "commit"}"')
+        heapq.heappush(self.freeLanes, self.lanes.pop(id))
+
+    def close(self):
+        self.file.write("\n]\n")
+        self.file.close()
+
+
+# Follows every dynamic instruction from fetch to commit or flush and streams its stages to the writers. Only the
+# instructions in flight are kept.
+class PipelineTimeline:
+    def __init__(self, writers):
+        self.writers = writers
+        self.nextId = 0
+        # Timeline ids of the fetched instructions still waiting to be decoded, in fetch order
+        self.fetched = collections.deque()
+        # Instruction id -> timeline id, from decode on
+        self.ids = {}
+        # Timeline id -> [pc, instruction, stage, stage start, fetch cycle]
+        self.states = {}
+
+    def fetch(self, pc, instruction, cycle):
+        id = self.nextId
+        self.nextId += 1
+        self.states[id] = [pc, instruction, "fetch", cycle, cycle]
+        self.fetched.append(id)
+        for writer in self.writers:
+            writer.begin(id, pc, instruction, cycle)
+            writer.stage(id, None, None, "fetch", cycle)
+
+    def move(self, id, stage, cycle):
+        state = self.states[id]
+        for writer in self.writers:
+            writer.stage(id, state[2], state[3], stage, cycle)
+        state[2] = stage
+        state[3] = cycle
+
+    def end(self, id, cycle, flushed):
+        pc, instruction, stage, stageStart, beginCycle = self.states.pop(id)
+        for writer in self.writers:
+            writer.end(id, pc, instruction, stage, stageStart, beginCycle, cycle, flushed)
+
+    # The oldest fetched instruction was decoded; instructions fetched before the timeline started are not followed
+    def decode(self, instructionId, cycle):
+        if self.fetched:
+            id = self.fetched.popleft()
+            self.ids[instructionId] = id
+            self.move(id, "decode", cycle)
+
+    def stage(self, instructionId, stage, cycle):
+        id = self.ids.get(instructionId)
+        if id is not None:
+            self.move(id, stage, cycle)
+
+    def retire(self, instructionId, cycle, flushed=False):
+        id = self.ids.pop(instructionId, None)
+        if id is not None:
+            self.end(id, cycle, flushed)
+
+    # Fetched instructions dropped before decode
+    def flushFetched(self, cycle):
+        for id in self.fetched:
+            self.end(id, cycle, True)
+        self.fetched.clear()
+
+    def close(self):
+        for writer in self.writers:
+            writer.close()
+
+
+def createTimeline(chromeTraceFile=None, konataFile=None):
+    writers = []
+    if chromeTraceFile is not None:
+        writers.append(ChromeTraceWriter(chromeTraceFile))
+    if konataFile is not None:
+        writers.append(KonataWriter(konataFile))
+    return PipelineTimeline(writers) if writers else None
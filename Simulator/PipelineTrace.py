@@ -0,0 +1,253 @@
+import bisect
+import pickle
+import struct
+import zlib
+from Simulator.RegisterHandler import registerName, robName
+
+# File layout: header, then one frame per cycle (a keyframe every keyframeInterval cycles, a delta otherwise),
+# then the keyframe index and a trailer pointing at it
+TRACE_MAGIC = b"RVPT"
+INDEX_MAGIC = b"RVPX"
+TRACE_VERSION = 2
+HEADER = struct.Struct("<4sHI")
+FRAME = struct.Struct("<BII")
+TRAILER = struct.Struct("<Q4s")
+KEYFRAME, DELTA = 0, 1
+
+
+# Compact, comparable snapshot of the machine state at the end of a cycle
+def captureState(processor):
+    rob = processor.ROB
+    registers = processor.registers
+    stations = {}
+    for station in processor.ReservationStation.stationList:
+        stations[station.Name] = {entry.instId: (entry.instruction, entry.op, entry.vj, entry.vk, entry.qj, entry.qk,
+                                                 entry.dest) for entry in station.entries if entry.busy}
+    return {
+        "pc": processor.PC,
+        "head": rob.head,
+        "tail": rob.tail,
+        "rob": [(entry.inst_id, entry.busy, entry.inst, entry.dest, entry.RR, entry.state, entry.value)
+                for entry in rob.entries],
+        "rs": stations,
+        "map": dict(processor.registerMappingTable.mappingTable),
+        "regs": list(zip(registers.values, registers.busy, registers.renames)),
+        "cdb": [tuple(data) for data in processor.CommonDataBus],
+        "stalls": dict(processor.stalls),
+    }
+
+
+def diffKeyed(previous, current):
+    changes = []
+    for key, value in current.items():
+        if previous.get(key) != value:
+            changes.append((key, value))
+    for key in previous:
+        if key not in current:
+            changes.append((key, None))
+    return changes
+
+
+def diffIndexed(previous, current):
+    return [(i, value) for i, value in enumerate(current) if i >= len(previous) or previous[i] != value]
+
+
+# Only the parts of the state that changed since the previous cycle
+def diffState(previous, current):
+    delta = {}
+    for key in ["pc", "head", "tail", "stalls"]:
+        if previous[key] != current[key]:
+            delta[key] = current[key]
+    for key in ["rob", "regs"]:
+        changes = diffIndexed(previous[key], current[key])
+        if changes:
+            delta[key] = changes
+    rsChanges = []
+    for name, entries in current["rs"].items():
+        for instId, entry in diffKeyed(previous["rs"].get(name, {}), entries):
+            rsChanges.append((name, instId, entry))
+    if rsChanges:
+        delta["rs"] = rsChanges
+    mapChanges = diffKeyed(previous["map"], current["map"])
+    if mapChanges:
+        delta["map"] = mapChanges
+    if current["cdb"]:
+        delta["cdb"] = current["cdb"]
+    return delta
+
+
+class PipelineTraceWriter:
+    def __init__(self, fileName, initialMemory, keyframeInterval=1000):
+        self.file = open(fileName, "wb")
+        self.keyframeInterval = keyframeInterval
+        self.index = []
+        self.previous = None
+        self.memory = {}
+        self.memoryWrites = []
+        self.file.write(HEADER.pack(TRACE_MAGIC, TRACE_VERSION, keyframeInterval))
+        self.writePayload(zlib.compress(pickle.dumps(initialMemory.copy(), pickle.HIGHEST_PROTOCOL)))
+
+    def writePayload(self, payload):
+        self.file.write(struct.pack("<I", len(payload)))
+        self.file.write(payload)
+
+    def memoryWrite(self, address, value):
+        self.memory[address] = value
+        self.memoryWrites.append((address, value))
+
+    def recordCycle(self, cycle, processor):
+        state = captureState(processor)
+        if self.previous is None or cycle - self.index[-1][0] >= self.keyframeInterval:
+            state["mem"] = dict(self.memory)
+            state["memWrites"] = self.memoryWrites
+            self.index.append((cycle, self.file.tell()))
+            payload = zlib.compress(pickle.dumps(state, pickle.HIGHEST_PROTOCOL))
+            kind = KEYFRAME
+        else:
+            delta = diffState(self.previous, state)
+            if self.memoryWrites:
+                delta["mem"] = self.memoryWrites
+            payload = pickle.dumps(delta, pickle.HIGHEST_PROTOCOL)
+            kind = DELTA
+        self.file.write(FRAME.pack(kind, cycle, len(payload)))
+        self.file.write(payload)
+        self.previous = state
+        self.memoryWrites = []
+
+    def close(self):
+        indexOffset = self.file.tell()
+        self.writePayload(pickle.dumps(self.index, pickle.HIGHEST_PROTOCOL))
+        self.file.write(TRAILER.pack(indexOffset, INDEX_MAGIC))
+        self.file.close()
+
+
+class PipelineTraceReader:
+    def __init__(self, fileName):
+        self.file = open(fileName, "rb")
+        magic, version, self.keyframeInterval = HEADER.unpack(self.file.read(HEADER.size))
+        if magic != TRACE_MAGIC or version != TRACE_VERSION:
+            raise ValueError(f"{fileName} is not a pipeline trace")
+        self.initialMemory = pickle.loads(zlib.decompress(self.readPayload()))
+        self.framesOffset = self.file.tell()
+        self.index = self.readIndex()
+        self.keyframeCycles = [cycle for cycle, offset in self.index]
+
+    def readPayload(self):
+        length, = struct.unpack("<I", self.file.read(4))
+        return self.file.read(length)
+
+    # Index from the trailer, or rebuilt by walking the frames if the run did not close the trace
+    def readIndex(self):
+        self.file.seek(0, 2)
+        end = self.file.tell()
+        if end - self.framesOffset >= TRAILER.size:
+            self.file.seek(end - TRAILER.size)
+            indexOffset, magic = TRAILER.unpack(self.file.read(TRAILER.size))
+            if magic == INDEX_MAGIC:
+                self.file.seek(indexOffset)
+                self.framesEnd = indexOffset
+                return pickle.loads(self.readPayload())
+        index = []
+        self.file.seek(self.framesOffset)
+        while True:
+            offset = self.file.tell()
+            frame = self.file.read(FRAME.size)
+            if len(frame) < FRAME.size:
+                break
+            kind, cycle, length = FRAME.unpack(frame)
+            if kind == KEYFRAME:
+                index.append((cycle, offset))
+            self.file.seek(length, 1)
+        self.framesEnd = offset
+        return index
+
+    def readFrame(self):
+        kind, cycle, length = FRAME.unpack(self.file.read(FRAME.size))
+        payload = self.file.read(length)
+        if kind == KEYFRAME:
+            return kind, cycle, pickle.loads(zlib.decompress(payload))
+        return kind, cycle, pickle.loads(payload)
+
+    def lastCycle(self):
+        cycle = None
+        self.file.seek(self.index[-1][1])
+        while self.file.tell() < self.framesEnd:
+            kind, cycle, length = FRAME.unpack(self.file.read(FRAME.size))
+            self.file.seek(length, 1)
+        return cycle
+
+    # Rebuild the full machine state at a cycle from the nearest keyframe at or before it
+    def stateAt(self, cycle):
+        position = bisect.bisect_right(self.keyframeCycles, cycle) - 1
+        if position < 0:
+            raise ValueError(f"Cycle {cycle} is before the start of the trace")
+        self.file.seek(self.index[position][1])
+        kind, frameCycle, state = self.readFrame()
+        while frameCycle < cycle and self.file.tell() < self.framesEnd:
+            kind, nextCycle, delta = self.readFrame()
+            if kind == KEYFRAME or nextCycle > cycle:
+                break
+            frameCycle = nextCycle
+            self.applyDelta(state, delta)
+        if frameCycle != cycle:
+            raise ValueError(f"Cycle {cycle} is not in the trace")
+        memory = self.initialMemory.copy()
+        for address, value in state["mem"].items():
+            memory[address] = value
+        state["memory"] = memory
+        state["cycle"] = cycle
+        return state
+
+    def applyDelta(self, state, delta):
+        for key in ["pc", "head", "tail", "stalls"]:
+            if key in delta:
+                state[key] = delta[key]
+        for key in ["rob", "regs"]:
+            for i, value in delta.get(key, []):
+                state[key][i] = value
+        for name, instId, entry in delta.get("rs", []):
+            entries = state["rs"].setdefault(name, {})
+            if entry is None:
+                entries.pop(instId, None)
+            else:
+                entries[instId] = entry
+        for key, value in delta.get("map", []):
+            if value is None:
+                state["map"].pop(key, None)
+            else:
+                state["map"][key] = value
+        state["cdb"] = delta.get("cdb", [])
+        state["memWrites"] = delta.get("mem", [])
+        for address, value in state["memWrites"]:
+            state["mem"][address] = value
+
+    def close(self):
+        self.file.close()
+
+
+# Render a rebuilt state in the same shape as the text simulation logs
+def formatState(state):
+    lines = [f"**********************************************CYCLE: {state['cycle']}"
+             f"**********************************************", f"PC: {state['pc']}", ""]
+    mapping = {key: registerName(register) for key, register in state["map"].items()}
+    lines.append(f"Register Mapping: {mapping}\n")
+    registers = ""
+    for i, (value, busy, rename) in enumerate(state["regs"]):
+        registers += f"'{registerName(i)}': [{busy}, {value}, {robName(rename)}], "
+    lines.append("Register Values: {" + registers + "}\n")
+    lines.append(f"         Head: {state['head']} || Tail: {state['tail']}")
+    for tag, (instId, busy, inst, dest, RR, robState, value) in enumerate(state["rob"]):
+        lines.append(f"inst_id:{instId}|name={robName(tag)}|busy={busy}|inst='{inst}'|dest={dest}|"
+                     f"rr={registerName(RR)}|state={robState}|")
+    lines.append("")
+    lines.append("              RESERVATION STATUS TABLE")
+    for name, entries in state["rs"].items():
+        for i, instId in enumerate(sorted(entries)):
+            instruction, op, vj, vk, qj, qk, dest = entries[instId]
+            lines.append(f"|{name}{i}|True|instr_id={instId}|instr=[{instruction}]|op={op}|vj={registerName(vj)} "
+                         f"|vk={registerName(vk)} |qj={robName(qj)} |qk={robName(qk)} |dest={robName(dest)}|")
+    lines.append("")
+    lines.append(f"Common Data Bus: {[[robName(rob), registerName(register)] for rob, register in state['cdb']]}\n")
+    lines.append(f"Memory Writes: {state['memWrites']}\n")
+    lines.append(f"Stalls: {state['stalls']}")
+    return "\n".join(lines)
@@ -1,49 +1,81 @@
 import logging, re
 from Simulator.InstructionClass import Instruction
-from Simulator.RegisterHandler import FreeRegisterTable, RegisterMappingTable, RegisterFile
+from Simulator.RegisterHandler import FreeRegisterTable, RegisterMappingTable, RegisterFile, registerName, robName
 from Simulator.ReservationStationAndROB import ReservationStation, ReorderBuffer, ReservationStationUnity
+from Simulator.PipelineTrace import PipelineTraceWriter
+from Simulator.Checkpoint import saveCheckpoint
+from Simulator.MachineDescription import DEFAULT_MACHINE
+from Simulator.BranchPredictor import BranchTargetBuffer, createPredictor
+from Simulator.Memory import saveMemory
+from Simulator.LoadStoreQueue import LoadStoreQueue, createDependencePredictor
+from Simulator.SimulationResult import PerformanceCounters, SimulationResult
+from Simulator.Profiler import Profiler
+from Simulator.ResultCache import ResultCache, isCacheable
+from Simulator.RingBuffer import RingBuffer
+from Simulator.PipelineTimeline import createTimeline
+from Simulator.TraceLog import TraceLog, TRACE_LEVELS, TRACE_SUMMARY, TRACE_STAGE, TRACE_FULL
 
 
-def decodeHelper(instruction):
-    op, inst = instruction.split(" ", 1)
-    if op in ["add", "addi", "fadd", "fsub", "fmul", "fdiv"]:
-        d, s1, s2 = inst.split(",")
-    elif op in ["fld", "fsd"]:
-        d, inst = inst.split(",")
-        s1, s2 = inst.split("(")
-        s2 = s2.replace(")", "")
-    elif op in ["bne"]:
-        d, s1, s2 = inst.split(",")
-    op, d, s1, s2 = op.strip(), d.strip(), s1.strip(), s2.strip()
-    return Instruction(op, d, s1, s2)
-
-
-def checkForRegister(s):
-    if s is None:
-        return False
-    if s[0] in ['-', '+']:
-        return not s[1:].isdigit()
-    return not s.isdigit()
+# Every parameter that decides the simulated machine, with the defaults filled in: configurations that build the same
+# machine give the same dict, whatever run options they carry
+def modelConfig(config):
+    return {"NF": config['NF'], "NW": config['NW'], "NR": config['NR'], "NB": config['NB'], "NP": config['NP'],
+            "NI": config.get('NI', 16), "ND": config.get('ND', config['NF']),
+            "loadQueue": config.get('loadQueue', 16), "storeQueue": config.get('storeQueue', 16),
+            "memoryDependence": config.get('memoryDependence', "none"),
+            "memoryDependenceEntries": config.get('memoryDependenceEntries', 1024),
+            "machine": config.get('machine') or DEFAULT_MACHINE,
+            "predictor": config.get('predictor', "1bit"), "predictorEntries": config.get('predictorEntries', 1024),
+            "historyBits": config.get('historyBits', 8), "btbEntries": config.get('btbEntries', 16),
+            "sampleInterval": config.get('sampleInterval', 100)}
 
 
 class Processor:
+    # Trace-driven processors model the timing only, without computing values
+    timingOnly = False
+
     def __init__(self, config, MainMemory, instructionFile):
+        self.config = config
         self.instructionFile = instructionFile
         self.PC = 0
         self.cycle = 0
         self.finished = False
+        # The last begin() returned a cached result instead of simulating
+        self.fromCache = False
 
         # Setting Configuration Values
-        self.NF, self.NW, self.NR, self.NB = config['NF'], config['NW'], config['NR'], config['NB']
+        self.model = model = modelConfig(config)
+        self.NF, self.NW, self.NR, self.NB = model['NF'], model['NW'], model['NR'], model['NB']
+        self.NP = model['NP']
+        # Instruction queue entries and instructions decoded per cycle
+        self.NI, self.ND = model['NI'], model['ND']
+        if self.ND < 1:
+            raise ValueError(f"decode width ND={self.ND} must be at least 1")
+        # Machines these sizes leave without room to issue, broadcast or commit would never finish
+        if self.NW < 1:
+            raise ValueError(f"issue width NW={self.NW} must be at least 1")
+        if self.NB < 1:
+            raise ValueError(f"common data bus width NB={self.NB} must be at least 1")
+        if self.NR < 2:
+            raise ValueError(f"reorder buffer size NR={self.NR} must be at least 2")
+        if model['loadQueue'] < 1 or model['storeQueue'] < 1:
+            raise ValueError(f"load queue size {model['loadQueue']} and store queue size {model['storeQueue']} "
+                             f"must be at least 1")
+        self.setRunOptions(config)
+        self.pipelineTrace = None
+        self.timeline = None
         self.MainMemory = MainMemory
 
         # Building Register File
-        self.registers = RegisterFile(32)
-        self.freeRegisters = FreeRegisterTable(list(self.registers.registers.keys()))
+        self.registers = RegisterFile(self.NP)
+        self.freeRegisters = FreeRegisterTable(self.NP)
         self.registerMappingTable = RegisterMappingTable()
 
-        # Building Reservation Stations
-        self.ReservationStation = ReservationStationUnity()
+        # Building Load/Store Queue and Reservation Stations
+        self.loadStoreQueue = LoadStoreQueue(model['loadQueue'], model['storeQueue'],
+                                             createDependencePredictor(model['memoryDependence'],
+                                                                       model['memoryDependenceEntries']))
+        self.ReservationStation = ReservationStationUnity(model['machine'], self.loadStoreQueue, self.timingOnly)
 
         # Building ReorderBuffer Table
         self.ROB = ReorderBuffer(self.NR)
@@ -51,124 +83,170 @@ class Processor:
         # Building Common Data Bus
         self.CommonDataBus = []
 
-        # Instruction Queue
-        self.DecodeQueue = []
-        self.InstructionQueue = []
+        # Decode Queue holds one fetch group, Instruction Queue NI decoded instructions waiting to issue
+        self.DecodeQueue = RingBuffer(self.NF)
+        self.InstructionQueue = RingBuffer(self.NI)
 
-        self.stalls = {"RS": 0, "ROB": 0, "CDB": 0}
+        self.stalls = {"RS": 0, "ROB": 0, "LSQ": 0, "CDB": 0, "IQ": 0}
+        self.counters = PerformanceCounters(self.NR, self.NB, model['sampleInterval'])
 
         # Branch Prediction BTB
-        self.BTB = {}
-        self.BranchPrediction = False
+        self.BTB = BranchTargetBuffer(model['btbEntries'])
+        self.predictor = createPredictor(model['predictor'], model['predictorEntries'], model['historyBits'])
 
-    # fetch instructions as NF size, push them to Decode Queue
+        # Port to a main memory shared with other cores, None if this core has the memory to itself
+        self.memoryPort = None
+
+    # Options that do not change the simulated machine, so they can also be changed on a restored checkpoint
+    def setRunOptions(self, config):
+        self.traceLevel = TRACE_LEVELS[config.get('traceLevel', "full")]
+        self.logFile = config.get('logFile') or "logs/simulationLogs"
+        self.pipelineTraceFile = config.get('pipelineTrace')
+        self.keyframeInterval = config.get('keyframeInterval', 1000)
+        self.eventDriven = config.get('eventDriven', False)
+        self.memoryOut = config.get('memoryOut')
+        self.checkpointFile = config.get('checkpointFile') or "logs/checkpoint.bin"
+        self.checkpointEvery = config.get('checkpointEvery')
+        self.checkpointPC = config.get('checkpointPC')
+        self.checkpointDue = False
+        self.profileFile = config.get('profile')
+        self.profileFoldedFile = config.get('profileFolded')
+        self.profiler = Profiler() if self.profileFile or self.profileFoldedFile else None
+        self.chromeTraceFile = config.get('chromeTrace')
+        self.konataFile = config.get('konata')
+        # Directory of the result cache, None to always simulate, and its size bound in bytes
+        self.cacheDir = config.get('cacheDir')
+        self.cacheSize = config.get('cacheSize', 256 * 1024 * 1024)
+        if self.checkpointEvery:
+            self.nextCheckpoint = (self.cycle // self.checkpointEvery + 1) * self.checkpointEvery
+
+    # fetch instructions as NF size, push them to Decode Queue; fetch stalls on the slots decode has not freed yet
     def fetch(self, instructionFile):
-        logging.info(f"[{self.cycle}]: STATE: FETCH")
-        windowSize = self.NF
+        traceStage = self.traceLevel >= TRACE_STAGE
+        if traceStage:
+            logging.info(f"[{self.cycle}]: STATE: FETCH")
+        windowSize = self.DecodeQueue.space()
         for i in range(windowSize):
             if self.PC >= len(instructionFile):
                 return self.DecodeQueue
             instruction = instructionFile[self.PC]
-            logging.info(f"[{self.cycle}]::Fetch:[{self.PC}]:: {instruction}")
+            if traceStage:
+                logging.info(f"[{self.cycle}]::Fetch:[{self.PC}]:: {instruction}")
             self.DecodeQueue.append(instruction)
+            if self.timeline is not None:
+                self.timeline.fetch(instruction.pc, instruction.instruction, self.cycle)
             self.PC = self.PC + 4
-        logging.info("")
+        if traceStage:
+            logging.info("")
         return self.DecodeQueue
 
-    # Register Renaming and Mapping for each register
-    def registerRenaming(self, register, isDestination=False):
+    # Whether fetch still has instructions to deliver
+    def fetchPending(self):
+        return self.PC < len(self.instructionFile)
+
+    # Registers decode has to allocate for an instruction: its destination and one for each source never written
+    def registersNeeded(self, template):
+        sources = set()
+        if template.s1IsRegister and self.registerMappingTable.isAlreadyMapped(template.s1) is None:
+            sources.add(template.s1)
+        if template.s2IsRegister and self.registerMappingTable.isAlreadyMapped(template.s2) is None:
+            sources.add(template.s2)
+        return len(sources) + (template.op not in ["fsd", "bne"])
+
+    # A source never written reads as 0 from a register of its own, which commits along with the instruction
+    def renameSource(self, instruction, register):
         renamedRegister = self.registerMappingTable.isAlreadyMapped(register)
-        if renamedRegister is None or isDestination is True:
+        if renamedRegister is None:
             renamedRegister = self.freeRegisters.isAvailable()
-            if renamedRegister is not None:
-                self.registerMappingTable.registerRenaming(register, renamedRegister)
-            else:
-                raise Exception("No register free!")
+            self.registers.values[renamedRegister] = 0
+            self.registerMappingTable.registerRenaming(register, renamedRegister)
+            instruction.allocated.append((register, renamedRegister))
         return renamedRegister
 
-    def registerMappingHelper(self, s1=None, s2=None, d=None):
-        try:
-            if s1 is not None:
-                s1 = self.registerRenaming(s1)
-            if s2 is not None:
-                s2 = self.registerRenaming(s2)
-            if d is not None:
-                d = self.registerRenaming(d, True)
-            return s1, s2, d
-        except Exception:
-            raise Exception("No register free!")
-
-    # Parsing Instructions and Register Renaming being Called as per Instruction Type
+    # Register Renaming: sources to the registers holding their newest values, the destination to a free register.
+    # Nothing is allocated unless every register the instruction needs is free.
     def registerMapping(self, instruction):
-        try:
-            op = instruction.op
-            if op in ["addi"]:
-                # d, s1
-                instruction.s1, _, instruction.dR = self.registerMappingHelper(instruction.s1, None, instruction.d)
-            elif op in ["add", "fmul", "fdiv", "fadd", "fsub"]:
-                # d, s1, s2
-                instruction.s1, instruction.s2, instruction.dR = self.registerMappingHelper(instruction.s1,
-                                                                                            instruction.s2,
-                                                                                            instruction.d)
-            elif op in ["fld"]:
-                # d, s2
-                _, instruction.s2, instruction.dR = self.registerMappingHelper(None, instruction.s2, instruction.d)
-            elif op in ["fsd"]:
-                instruction.s1, instruction.s2 = self.registerRenaming(instruction.s1), self.registerRenaming(
-                    instruction.s2)
-            elif op in ["bne"]:
-                # d, s1
-                instruction.s1, instruction.s2 = self.registerRenaming(instruction.s1), self.registerRenaming(
-                    instruction.s2)
-        except Exception:
+        template = instruction.template
+        if len(self.freeRegisters) < self.registersNeeded(template):
             raise Exception("No register free!")
+        if template.s1IsRegister:
+            instruction.s1 = self.renameSource(instruction, instruction.s1)
+        if template.s2IsRegister:
+            instruction.s2 = self.renameSource(instruction, instruction.s2)
+        if instruction.op not in ["fsd", "bne"]:
+            instruction.dR = self.freeRegisters.isAvailable()
+            self.registerMappingTable.registerRenaming(instruction.d, instruction.dR)
+        instruction.freeHead = self.freeRegisters.head
+        # A branch keeps the map as of right after it, to recover from a misprediction in one step
+        if instruction.op == "bne":
+            instruction.snapshot = self.registerMappingTable.snapshot()
 
     # Create an ROB Entry for the Instruction
     def createROBEntry(self, instruction):
         robEntry = self.ROB.getROB()
         robEntry.state = "Decode"
-        robEntry.busy = True
         robEntry.inst_id = instruction.instructionId
         # Setup the Reservation Stations Entry
         robEntry.inst = instruction.instruction
+        robEntry.pc = instruction.pc
+        robEntry.op = instruction.op
+        robEntry.predictedTaken = instruction.predictedTaken
+        robEntry.times = None
+        robEntry.allocated = instruction.allocated
+        robEntry.freeHead = instruction.freeHead
+        robEntry.snapshot = instruction.snapshot
+        robEntry.history = instruction.history
+        robEntry.mispredicted = False
         robEntry.dest = instruction.d
+        # Stores and branches have no destination register, clear the one left by the entry's last occupant
+        robEntry.RR = None
         if not instruction.op in ["fsd", "bne"]:
             robEntry.RR = instruction.dR
             # Now we need to map the ROB with RR register
-            robRegister = self.registers.registers[instruction.dR]
-            if robRegister:
-                robRegister.rename = robEntry.name
-                robRegister.busy = True
+            self.registers.renameRegister(instruction.dR, robEntry.tag)
         return robEntry
 
+    # The register holds its value, or its producer already broadcast it and will not broadcast again
+    def operandReady(self, register):
+        if not self.registers.busy[register]:
+            return True
+        return self.ROB.entries[self.registers.renames[register]].state == "WriteBack"
+
     # Create Reservation Station and ROB Entry
     def createROBAndRSEntryHelper(self, instruction):
         # Fetch a RS
         rs = self.ReservationStation.getStation(instruction.op)
         rs.instId = instruction.instructionId
-        rs.busy = True
         # Create a ROB Entry
         robEntry = self.createROBEntry(instruction)
         rs.op = instruction.op
-        rs.dest = robEntry.name
+        rs.dest = robEntry.tag
         rs.instruction = instruction.instruction
+        rs.address = instruction.template.address
+        rs.taken = instruction.template.taken
         # Update RS Entry for Vj, Vk or Qj, Qk
-        if checkForRegister(instruction.s1):
-            s1 = self.registers.registers[instruction.s1]
-            if not s1.busy:
-                rs.vj = s1.name
+        if instruction.template.s1IsRegister:
+            s1 = instruction.s1
+            if self.operandReady(s1):
+                rs.vj = s1
             else:
-                rs.qj = s1.rename
+                rs.qj = self.registers.renames[s1]
         else:
             rs.vj = instruction.s1
-        if checkForRegister(instruction.s2):
-            s2 = self.registers.registers[instruction.s2]
-            if not s2.busy:
-                rs.vk = s2.name
+        if instruction.template.s2IsRegister:
+            s2 = instruction.s2
+            if self.operandReady(s2):
+                rs.vk = s2
             else:
-                rs.qk = s2.rename
+                rs.qk = self.registers.renames[s2]
         else:
             rs.vk = instruction.s2
+        self.ReservationStation.issueEntry(instruction.op, rs)
+        self.loadStoreQueue.insert(instruction, rs)
+        if self.profiler is not None:
+            self.profiler.issue(robEntry, instruction.decodeCycle, rs.ready, self.cycle)
+        if self.timeline is not None:
+            self.timeline.stage(instruction.instructionId, "issue", self.cycle)
 
     # Checking for available ROB free and Reservation Station free and implementing accordingly
     def createROBAndRSEntry(self):
@@ -176,166 +254,254 @@ class Processor:
         for i in range(self.NW):
             if not self.InstructionQueue:
                 return
-            instruction = self.InstructionQueue.pop(0)
-            # returns True if free rob entry else False
-            rob = self.ROB.isAvailable()
-            if rob:
-                # returns True if free RS else False
-                rs = self.ReservationStation.isAvailable(instruction.op)
-                if rs:
-                    self.createROBAndRSEntryHelper(instruction)
-                else:
-                    # stalls for one instruction if RS not available
-                    self.stalls["RS"] += 1
-                    self.InstructionQueue.insert(0, instruction)
-                    return
-            else:
-                # Stalls for all if no ROB available
-                self.stalls["ROB"] += 1
-                self.InstructionQueue.insert(0, instruction)
+            instruction = self.InstructionQueue.first()
+            stall = self.issueStall(instruction)
+            if stall is not None:
+                self.stalls[stall] += 1
                 return
+            self.InstructionQueue.popleft()
+            self.createROBAndRSEntryHelper(instruction)
+
+    # Reason the instruction cannot be issued this cycle, None if it can
+    def issueStall(self, instruction):
+        # Stalls for all if no ROB available
+        if not self.ROB.isAvailable():
+            return "ROB"
+        # stalls for one instruction if RS not available
+        if not self.ReservationStation.isAvailable(instruction.op):
+            return "RS"
+        # Loads and stores also need a load/store queue entry until they commit
+        if not self.loadStoreQueue.isAvailable(instruction.op):
+            return "LSQ"
+        return None
 
     # Branch Prediction
+    # Direction from the predictor, target from the BTB which decode fills on a miss since the target is known here.
+    # The predicted direction enters the global history right away, so the next branch is predicted with it.
     def predictBranch(self, instruction):
-        if not self.BranchPrediction:
+        instruction.predictedTaken = self.predictor.predict(instruction.pc)
+        self.predictor.speculate(instruction.predictedTaken)
+        if not instruction.predictedTaken:
             return self.PC
-        address = self.instructionFile.index(instruction.instruction)
-        address = format(address, "b")
-        value = self.BTB.get(address)
-        if value is None:
-            self.BTB[address] = int(instruction.d)
-        return self.BTB[address]
+        target = self.BTB.lookup(instruction.pc)
+        if target is None:
+            target = instruction.template.target
+            self.BTB.insert(instruction.pc, target)
+        return target
+
+    # The rest of the fetch group follows a branch predicted taken in program order, off the predicted path
+    def redirectFetch(self):
+        self.DecodeQueue.clear()
+        if self.timeline is not None:
+            self.timeline.flushFetched(self.cycle)
 
     # Instruction Decode, Register Mapping, Register Renaming, Reservation Station and ROB Entry
     def decode(self):
-        logging.info(f"[{self.cycle}]: STATE: DECODE")
-        # Instruction Decode Step into Instruction Object
-        while len(self.DecodeQueue) > 0:
-            instruction = self.DecodeQueue.pop(0)
+        traceStage = self.traceLevel >= TRACE_STAGE
+        if traceStage:
+            logging.info(f"[{self.cycle}]: STATE: DECODE")
+        # Instruction Decode Step: clone the pre-decoded template into an Instruction Object, up to ND a cycle
+        for i in range(self.ND):
+            if not self.DecodeQueue:
+                break
+            if self.InstructionQueue.isFull():
+                self.stalls["IQ"] += 1
+                if traceStage:
+                    logging.info(f"[{self.cycle}]:: Exiting Decoding as the instruction queue is full.")
+                break
+            instruction = self.DecodeQueue.first()
             try:
-                instructionObj = decodeHelper(instruction)
+                instructionObj = Instruction(instruction)
+                instructionObj.decodeCycle = self.cycle
                 # Register Renaming
                 self.registerMapping(instructionObj)
-                instructionObj.instruction = instruction
-                logging.info(f"[{self.cycle}]: {str(instructionObj)}")
-                self.InstructionQueue.append(instructionObj)
-                if instructionObj.op == "bne":
-                    self.PC = self.predictBranch(instructionObj)
             except Exception:
-                self.DecodeQueue.insert(0, instruction)
-                logging.info(f"[{self.cycle}]:: Exiting Decoding as no register in free list.")
+                # Registers are only freed by commits, with nothing in flight none will ever be
+                if self.ROB.isEmpty() and not self.InstructionQueue:
+                    raise ValueError(f"NP={self.NP} physical registers cannot hold every architectural register and "
+                                     f"a destination for '{instruction}'")
+                if traceStage:
+                    logging.info(f"[{self.cycle}]:: Exiting Decoding as no register in free list.")
                 break
+            self.DecodeQueue.popleft()
+            # The predictor history before the instruction, which a flush after it goes back to
+            instructionObj.history = self.predictor.getHistory()
+            if traceStage:
+                logging.info(f"[{self.cycle}]: {str(instructionObj)}")
+            self.InstructionQueue.append(instructionObj)
+            if self.timeline is not None:
+                self.timeline.decode(instructionObj.instructionId, self.cycle)
+            if instructionObj.op == "bne":
+                self.PC = self.predictBranch(instructionObj)
+                if instructionObj.predictedTaken:
+                    self.redirectFetch()
         # Creating and ROB and RS Entry
         self.createROBAndRSEntry()
         # Log ALl Tables and Mappings
-        logging.info(f"\nRegister Mapping: {self.registerMappingTable.mappingTable}\n")
-        logging.info(f"Free Registers: {self.freeRegisters.freeRegisters}\n")
-        logging.info(f"Register Values: {str(self.registers)}\n")
-        logging.info(str(self.ROB))
-        logging.info(str(self.ReservationStation))
+        if self.traceLevel >= TRACE_FULL:
+            self.logTables()
 
     # Execute All Reservation Station's Functional Units
     def execute(self):
-        logging.info(f"[{self.cycle}]: STATE: EXECUTE")
+        if self.traceLevel >= TRACE_STAGE:
+            logging.info(f"[{self.cycle}]: STATE: EXECUTE")
         # Execute All Reservation Stations
-        self.ReservationStation.execute(self.CommonDataBus, self.ROB, self.registers, self.MainMemory,
-                                        self.registerMappingTable.mappingTable)
+        started = self.ReservationStation.execute(self.ROB, self.registers, self.MainMemory)
+        if self.timeline is not None:
+            for instId in started:
+                self.timeline.stage(instId, "execute", self.cycle)
         # Log ALl Tables and Mappings
-        logging.info(f"\nRegister Mapping: {self.registerMappingTable.mappingTable}\n")
-        logging.info(f"Free Registers: {self.freeRegisters.freeRegisters}\n")
-        logging.info(f"Register Values: {str(self.registers)}\n")
-        logging.info(str(self.ROB))
-        logging.info(str(self.ReservationStation))
+        if self.traceLevel >= TRACE_FULL:
+            self.logTables()
         self.CommonDataBus = []
 
     # Write Back stage for entries that have completed execution
     def writeBack(self):
         robEntries = self.ROB.entries
-        for robEntry in robEntries:
+        completed = self.ROB.completed
+        mispredicted = None
+        # Only entries that finished execution are visited, oldest first from the ROB head so a full CDB stalls the
+        # youngest ones
+        head, size = self.ROB.head, self.ROB.size
+        for tag in sorted(completed, key=lambda tag: (tag - head) % size):
+            robEntry = robEntries[tag]
             if robEntry.state == "Execution Complete":
                 robEntry.state = "Ready For WriteBack"
+                # Branches resolve as soon as they finish; the oldest one that went against its prediction flushes
+                if robEntry.op == "bne" and (robEntry.value is not None) != robEntry.predictedTaken:
+                    if mispredicted is None or robEntry.inst_id < mispredicted.inst_id:
+                        mispredicted = robEntry
+                if self.profiler is not None:
+                    self.profiler.complete(robEntry, self.cycle)
+                if self.timeline is not None:
+                    self.timeline.stage(robEntry.inst_id, "complete", self.cycle)
             elif robEntry.state == "Ready For WriteBack":
                 if len(self.CommonDataBus) < self.NB:
-                    self.CommonDataBus.append([robEntry.name, robEntry.RR])
+                    self.CommonDataBus.append([robEntry.tag, robEntry.RR])
                     robEntry.state = "WriteBack"
+                    if self.profiler is not None:
+                        self.profiler.broadcast(robEntry, self.cycle)
+                    if self.timeline is not None:
+                        self.timeline.stage(robEntry.inst_id, "writeBack", self.cycle)
+                    completed.discard(tag)
                 else:
                     self.stalls["CDB"] += 1
-                    logging.info(f"Common Data Bus: {str(self.CommonDataBus)}\n")
-                    return
-        logging.info(f"Common Data Bus: {str(self.CommonDataBus)}\n")
+                    break
+            else:
+                # Entry was reallocated before it reached write back
+                completed.discard(tag)
+        if mispredicted is not None:
+            self.branchFlush(mispredicted)
+        if self.traceLevel >= TRACE_STAGE:
+            self.logCommonDataBus()
 
-    # Updating the register file, freeing registers and updating values
-    def updateRegisterFile(self, rob, robRegister):
+    def logCommonDataBus(self):
+        logging.info(f"Common Data Bus: {str([[robName(rob), registerName(register)] for rob, register in self.CommonDataBus])}\n")
+
+    # The committing instruction's mappings become architectural, freeing the register its destination held before
+    def updateRegisterFile(self, rob):
+        registerMappingTable = self.registerMappingTable
+        for register, physicalRegister in rob.allocated:
+            registerMappingTable.commitMapping(register, physicalRegister)
+        robRegister = rob.RR
         if robRegister is None:
             return
-        register = self.registers.registers[robRegister]
-        originalRegister = rob.dest
-        if register.name == self.registerMappingTable.mappingTable[originalRegister][0]:
-            register.busy = False
-            register.rename = None
+        self.registers.busy[robRegister] = False
+        self.registers.clearRename(robRegister)
+        previous = registerMappingTable.commitMapping(rob.dest, robRegister)
+        if previous is not None:
+            self.freeRegisters.addRegister(previous)
+
+    # A branch resolved against its prediction: squash what came after it and fetch from the right path
+    def branchFlush(self, robEntry):
+        if self.traceLevel >= TRACE_STAGE:
+            logging.info(f"[{self.cycle}]: BRANCH FLUSH at {robEntry.pc}, True Value:{robEntry.value is not None}, "
+                         f"Predicted Value:{robEntry.predictedTaken}")
+        robEntry.mispredicted = True
+        self.counters.branchFlush(self.flushAfter(robEntry))
+        self.PC = int(robEntry.value) if robEntry.value is not None else robEntry.pc + 4
+
+    # A load at the head read stale data: it commits the value now in memory and everything after it is refetched
+    def memoryOrderFlush(self, robHead, load):
+        if self.traceLevel >= TRACE_STAGE:
+            logging.info(f"[{self.cycle}]: MEMORY ORDER FLUSH at {robHead.pc}, address {load.address}")
+        robHead.value = self.MainMemory[load.address]
+        self.registers.values[robHead.RR] = robHead.value
+        self.flushAfter(robHead)
+        self.PC = robHead.pc + 4
+
+    # Squash every instruction younger than robEntry, by instruction id, returning how many were squashed. Older
+    # instructions carry on. The rename map goes back to the one a branch saved, or for the ROB head to the committed
+    # map plus the head's own mappings, and the registers allocated after robEntry go back to the free list. The
+    # predictor history loses the predictions after robEntry and a branch's own one is replaced by its outcome.
+    def flushAfter(self, robEntry):
+        squashedEntries = self.ROB.flushAfter(robEntry)
+        squashed = len(squashedEntries) + len(self.DecodeQueue) + len(self.InstructionQueue)
+        if self.timeline is not None:
+            for squashedEntry in squashedEntries:
+                self.timeline.retire(squashedEntry.inst_id, self.cycle, True)
+            for instruction in self.InstructionQueue:
+                self.timeline.retire(instruction.instructionId, self.cycle, True)
+            self.timeline.flushFetched(self.cycle)
+        squashedTags = set()
+        for squashedEntry in squashedEntries:
+            squashedTags.add(squashedEntry.tag)
+            if squashedEntry.RR is not None:
+                self.registers.busy[squashedEntry.RR] = False
+        if robEntry.snapshot is not None:
+            self.registerMappingTable.restore(robEntry.snapshot)
         else:
-            if register.name in self.registerMappingTable.mappingTable[originalRegister]:
-                self.registerMappingTable.mappingTable[originalRegister].remove(register.name)
-            register.busy = False
-            self.registers.registers[self.registerMappingTable.mappingTable[originalRegister][0]].value = register.value
-            self.freeRegisters.addRegister(register.name)
-
-    # Flushing the instructions in case of mis-prediction
-    def branchFlush(self):
-        logging.info(f"[{self.cycle}]: BRANCH FLUSH")
-        self.ROB.tail = self.ROB.tail - 1 if self.ROB.tail > 0 else len(self.ROB.entries) - 1
-        while self.ROB.head != self.ROB.tail:
-            if self.ROB.head == self.ROB.tail:
-                continue
-            robEntry = self.ROB.entries[self.ROB.tail]
-            robEntry.busy = False
-            robRegister = robEntry.RR
-            if robRegister is not None:
-                register = self.registers.registers[robRegister]
-                originalRegister = robEntry.dest
-                if checkForRegister(originalRegister) and register.name in self.registerMappingTable.mappingTable[
-                    originalRegister]:
-                    self.registerMappingTable.mappingTable[originalRegister].remove(register.name)
-                register.busy = False
-                self.freeRegisters.addRegister(register.name)
-            self.ROB.tail = self.ROB.tail - 1 if self.ROB.tail > 0 else len(self.ROB.entries) - 1
-        self.ROB.tail = self.ROB.head + 1
-        if self.ROB.tail >= len(self.ROB.entries):
-            self.ROB.tail = 0
-        self.ReservationStation.flush()
-        self.CommonDataBus = []
-        self.DecodeQueue = []
-        for instruction in self.InstructionQueue:
-            if checkForRegister(instruction.dR):
-                originalRegister = instruction.d
-                self.registerMappingTable.mappingTable[originalRegister].remove(instruction.dR)
-                self.registers.registers[instruction.dR].busy = False
-                self.freeRegisters.addRegister(instruction.dR)
-        self.InstructionQueue = []
+            mapping = dict(self.registerMappingTable.committed)
+            mapping.update(robEntry.allocated)
+            if robEntry.RR is not None:
+                mapping[robEntry.dest] = robEntry.RR
+            self.registerMappingTable.restore(mapping)
+        self.freeRegisters.restore(robEntry.freeHead)
+        self.predictor.restore(robEntry.history)
+        if robEntry.op == "bne":
+            self.predictor.speculate(robEntry.value is not None)
+        self.ReservationStation.flushAfter(robEntry.inst_id)
+        self.CommonDataBus = [data for data in self.CommonDataBus if data[0] not in squashedTags]
+        self.DecodeQueue.clear()
+        self.InstructionQueue.clear()
+        return squashed
 
     # Commit for ROB Head if WriteBack is done
     def commit(self):
         # Commit the head of ROB
         robHead = self.ROB.commitHead()
         if robHead and robHead.state == "WriteBack" and len(self.CommonDataBus) < self.NB:
-            if robHead.inst.find("bne") != -1:
+            # A store to shared memory commits only in a cycle it gets a memory port
+            if robHead.op == "fsd" and self.memoryPort is not None and not self.memoryPort.acquire():
+                return
+            if robHead.op == "bne":
                 branchTaken = True if robHead.value is not None else False
-                # Compare with prediction: if same move on with commit
-                if branchTaken != self.BranchPrediction:
-                    logging.info(f"[{self.cycle}]: True Value:{branchTaken}, Predicted Value:{self.BranchPrediction}")
-                    self.BranchPrediction = True if not self.BranchPrediction else False
-                    self.branchFlush()
-                    self.PC = int(robHead.value) if robHead.value is not None else self.instructionFile.index(
-                        robHead.inst) + 4
+                self.predictor.update(robHead.pc, branchTaken, robHead.history)
+                # The misprediction was already flushed when the branch resolved
+                if robHead.mispredicted:
+                    self.counters.mispredictedBranch(robHead.pc)
+            elif robHead.op in ["fld", "fsd"]:
+                memoryOperation = self.loadStoreQueue.commit(robHead.inst_id, robHead.op)
+                if memoryOperation.violated:
+                    self.memoryOrderFlush(robHead, memoryOperation)
             self.ROB.updateHead()
-            if "fsd" in robHead.inst:
+            if robHead.op == "fsd" and not self.timingOnly:
                 self.MainMemory[robHead.dest] = robHead.value
+                if self.pipelineTrace is not None:
+                    self.pipelineTrace.memoryWrite(robHead.dest, robHead.value)
             robHead.state = "Commit"
-            robHead.busy = False
-            if robHead.RR is not None and checkForRegister(robHead.RR):
-                self.CommonDataBus.append([robHead.name, robHead.RR])
-            if "fsd" not in robHead.inst and "bne" not in robHead.inst:
-                self.updateRegisterFile(robHead, robHead.RR)
+            self.counters.commitInstruction(robHead.op)
+            if self.profiler is not None:
+                self.profiler.commit(robHead, self.ReservationStation.Stations[robHead.op].latency, self.cycle)
+            if self.timeline is not None:
+                self.timeline.retire(robHead.inst_id, self.cycle)
+            if robHead.pc == self.checkpointPC:
+                self.checkpointDue = True
+                self.checkpointPC = None
+            self.ROB.releaseEntry(robHead)
+            if robHead.RR is not None:
+                self.CommonDataBus.append([robHead.tag, robHead.RR])
+            self.updateRegisterFile(robHead)
             self.commit()
         else:
             return
@@ -343,40 +509,204 @@ class Processor:
     # Pipelining the stages
     def pipelining(self, instructionFile):
         self.fetch(instructionFile)
-        if len(self.DecodeQueue) == 0 and self.ROB.isEmpty():
+        # Done once nothing is left to decode, issue or commit
+        if len(self.DecodeQueue) == 0 and len(self.InstructionQueue) == 0 and self.ROB.isEmpty():
             return True
-        # Decode is done starting from 1st Cycle
+        # Decode is done starting from 1st Cycle, once last cycle's broadcasts have woken the entries waiting on them,
+        # so a ROB tag reused by this decode never picks up a broadcast from its previous occupant
         if self.cycle > 0:
+            woken = self.ReservationStation.wakeup(self.CommonDataBus)
+            if self.profiler is not None:
+                for entry in woken:
+                    self.profiler.ready(self.ROB.entries[entry.dest], self.cycle)
             self.decode()
         # Execute starts from 1 cycle as well
         if self.cycle > 0:
             self.execute()
         if self.cycle > 1:
             self.writeBack()
+        committed = self.counters.instructions
         self.commit()
+        # A cycle in which nothing committed is charged to the instruction holding up the ROB head
+        if self.profiler is not None and self.counters.instructions == committed and not self.ROB.isEmpty():
+            self.profiler.headBlocked(self.ROB.entries[self.ROB.head])
         return False
 
-    # Begin the Pipeline process till finished
-    def begin(self):
-        # Initiate Server Logs
-        logFile = "logs/simulationLogs"
-        with open(logFile, 'r+') as f:
-            f.truncate(0)
-        logging.basicConfig(filename=logFile, format='%(message)s', level=logging.INFO)
-        while not self.finished:
+    # Decode cannot rename the instruction: fewer free registers than it needs
+    def decodeBlocked(self, instruction):
+        return len(self.freeRegisters) < self.registersNeeded(instruction)
+
+    # Number of upcoming cycles in which nothing but functional unit countdowns can change
+    def idleCycles(self):
+        if self.cycle < 2 or self.CommonDataBus or self.ROB.completed or self.ROB.isEmpty():
+            return 0
+        if (self.fetchPending() and not self.DecodeQueue.isFull()) or self.ROB.commitHead() is not None:
+            return 0
+        if self.DecodeQueue and not self.InstructionQueue.isFull() and not self.decodeBlocked(self.DecodeQueue.first()):
+            return 0
+        if self.InstructionQueue and self.issueStall(self.InstructionQueue.first()) is None:
+            return 0
+        cycles = None
+        loadStoreStations = self.ReservationStation.memoryStations
+        for station in self.ReservationStation.stationList:
+            unit = station.functionalUnit
+            if station in loadStoreStations:
+                # Loads and stores are selected by the load/store queue
+                if unit.executing or station.readyEntries:
+                    return 0
+                continue
+            remaining = unit.quietCycles(bool(station.readyEntries))
+            if remaining is not None:
+                cycles = remaining if cycles is None else min(cycles, remaining)
+        return cycles if cycles is not None else 0
+
+    # Jump over idle cycles, accounting them exactly as if they had been simulated
+    def fastForward(self, cycles):
+        if self.traceLevel >= TRACE_STAGE:
+            logging.info(f"[{self.cycle}]: FAST FORWARD {cycles} idle cycles")
+        for unit in self.ReservationStation.functionalUnits():
+            unit.skip(cycles)
+        if self.InstructionQueue:
+            self.stalls[self.issueStall(self.InstructionQueue.first())] += cycles
+        if self.DecodeQueue and self.InstructionQueue.isFull():
+            self.stalls["IQ"] += cycles
+        self.counters.sampleIdleCycles(self.cycle, cycles, self.ROB.count, self.ReservationStation.stationList)
+        if self.profiler is not None:
+            self.profiler.headBlocked(self.ROB.entries[self.ROB.head], cycles)
+        self.cycle += cycles
+
+    # Simulate one clock cycle
+    def step(self):
+        if self.traceLevel >= TRACE_STAGE:
             logging.info(
                 f"**********************************************CYCLE: {self.cycle}**********************************************")
-            self.finished = self.pipelining(self.instructionFile)
-            self.cycle += 1
-        # Log ALl Tables and Mappings
-        logging.info(f"\nRegister Mapping: {self.registerMappingTable.mappingTable}\n")
-        logging.info(f"Free Registers: {self.freeRegisters.freeRegisters}\n")
+        self.finished = self.pipelining(self.instructionFile)
+        if self.pipelineTrace is not None:
+            self.pipelineTrace.recordCycle(self.cycle, self)
+        self.counters.sampleCycle(self.cycle, self.ROB.count, len(self.CommonDataBus),
+                                  self.ReservationStation.stationList)
+        self.cycle += 1
+
+    # Save a checkpoint every checkpointEvery cycles, and once when the instruction at checkpointPC first commits
+    def checkpoint(self):
+        if self.checkpointEvery and self.cycle >= self.nextCheckpoint:
+            self.nextCheckpoint = (self.cycle // self.checkpointEvery + 1) * self.checkpointEvery
+            self.checkpointDue = True
+        if not self.checkpointDue:
+            return
+        self.checkpointDue = False
+        if self.traceLevel >= TRACE_STAGE:
+            logging.info(f"[{self.cycle}]: CHECKPOINT {self.checkpointFile}")
+        saveCheckpoint(self, self.checkpointFile)
+
+    # Loads and committing stores go through this port, see MultiCore.MemoryPort
+    def attachMemoryPort(self, memoryPort):
+        self.memoryPort = memoryPort
+        self.loadStoreQueue.memoryPort = memoryPort
+
+    # Start from an architectural state reached elsewhere, e.g. by functional fast-forward
+    def loadArchitecturalState(self, PC, registers, predictor, BTB):
+        if len(registers) > self.NP:
+            raise ValueError(f"NP={self.NP} cannot hold {len(registers)} architectural registers")
+        self.PC = PC
+        for register, value in registers.items():
+            physicalRegister = self.freeRegisters.isAvailable()
+            self.registerMappingTable.registerRenaming(register, physicalRegister)
+            self.registerMappingTable.commitMapping(register, physicalRegister)
+            self.registers.values[physicalRegister] = value
+        # Branch state warmed up by whoever produced the architectural state
+        self.predictor = predictor
+        self.BTB = BTB
+
+    # The result cache, if this run may use it: a fresh run of a program, on a memory of its own, with no output the
+    # cache cannot give back
+    def openResultCache(self):
+        if self.cacheDir is None or self.cycle > 0 or self.timingOnly or self.memoryPort is not None:
+            return None
+        if not isCacheable(self.config):
+            return None
+        return ResultCache(self.cacheDir, self.cacheSize)
+
+    # Begin the Pipeline process till finished
+    def begin(self):
+        # A run that was done before returns its cached result and final memory without simulating
+        cache = self.openResultCache()
+        if cache is not None:
+            key = cache.key(self.instructionFile, self.MainMemory, self.getModelConfig())
+            result = cache.load(key)
+            if result is not None:
+                self.fromCache = True
+                self.MainMemory = result.memory
+                if self.memoryOut is not None:
+                    saveMemory(self.MainMemory, self.memoryOut)
+                return result
+        # Initiate Server Logs, written by a background thread
+        traceLog = TraceLog(self.logFile, self.traceLevel)
+        traceLog.start()
+        # Binary delta trace of the pipeline state, if requested
+        if self.pipelineTraceFile is not None:
+            self.pipelineTrace = PipelineTraceWriter(self.pipelineTraceFile, self.MainMemory, self.keyframeInterval)
+        # Stage timeline of every instruction, streamed to Chrome trace-event JSON and/or Konata
+        self.timeline = createTimeline(self.chromeTraceFile, self.konataFile)
+        # A pipeline trace needs every cycle, so it keeps the cycle by cycle mode
+        eventDriven = self.eventDriven and self.pipelineTrace is None
+        try:
+            while not self.finished:
+                if eventDriven:
+                    cycles = self.idleCycles()
+                    if cycles > 0:
+                        self.fastForward(cycles)
+                self.step()
+                if not self.finished:
+                    self.checkpoint()
+            self.counters.closeInterval(self.cycle - 1)
+            # Final memory, in the format given by the file extension
+            if self.memoryOut is not None:
+                saveMemory(self.MainMemory, self.memoryOut)
+            if self.profiler is not None:
+                self.profiler.save(self.profileFile, self.profileFoldedFile)
+            if self.traceLevel >= TRACE_SUMMARY:
+                self.logSummary()
+        finally:
+            traceLog.stop()
+            if self.pipelineTrace is not None:
+                self.pipelineTrace.close()
+            if self.timeline is not None:
+                self.timeline.close()
+                self.timeline = None
+        result = self.getResult()
+        if cache is not None:
+            cache.store(key, result)
+        return result
+
+    # The machine parameters it was built with, defaults filled in
+    def getModelConfig(self):
+        return dict(self.model)
+
+    # Structured statistics of the finished run
+    def getResult(self):
+        return SimulationResult(self.getModelConfig(), self.cycle, self.counters, self.stalls,
+                                self.ReservationStation.getUnitBusyCycles(), self.getVirtualMappingValueTable(),
+                                self.MainMemory, self.BTB, self.loadStoreQueue)
+
+    # Log the register tables, ROB and reservation stations
+    def logTables(self):
+        logging.info(f"\nRegister Mapping: {self.registerMappingTable}\n")
+        logging.info(f"Free Registers: {self.freeRegisters}\n")
+        logging.info(f"Register Values: {str(self.registers)}\n")
+        logging.info(str(self.ROB))
+        logging.info(str(self.ReservationStation))
+
+    # Log ALl Tables and Mappings at the end of the simulation
+    def logSummary(self):
+        logging.info(f"\nRegister Mapping: {self.registerMappingTable}\n")
+        logging.info(f"Free Registers: {self.freeRegisters}\n")
         logging.info(f"Register Values: {str(self.registers)}\n")
         register = self.getVirtualMappingValueTable()
         logging.info(f"Architected Register Values: {str(register)}\n")
         mainMemory = []
-        for i in range(0, len(self.MainMemory), 8):
-            mainMemory.append(f"[{i} : {self.MainMemory[i]}]")
+        for i, value in self.MainMemory.words(8):
+            mainMemory.append(f"[{i} : {value}]")
         logging.info(f"Main Memory: {str(mainMemory)}\n")
         logging.info(str(self.ROB))
         logging.info(str(self.ReservationStation))
@@ -386,5 +716,5 @@ class Processor:
     def getVirtualMappingValueTable(self):
         register = {}
         for key, value in self.registerMappingTable.mappingTable.items():
-            register[key] = self.registers.registers[value[0]].value
+            register[key] = self.registers.values[value]
         return register
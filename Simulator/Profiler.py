@@ -0,0 +1,97 @@
+# Stages of an instruction's life the profiler charges its cycles to, in order, then the cycles it held up commit
+PROFILE_STAGES = ["queue", "operands", "unit", "execute", "writeBack", "commit"]
+PROFILE_COLUMNS = PROFILE_STAGES + ["headBlocked"]
+
+# Index of each stage's decode/issue/ready/complete/broadcast timestamp in ReorderBufferEntry.times
+DECODE, ISSUE, READY, COMPLETE, BROADCAST = range(5)
+
+
+# Charges every cycle of each committed instruction to its static PC, by stage:
+#   queue      decoded, waiting in the instruction queue for a ROB and RS entry
+#   operands   in the RS, waiting for its operands
+#   unit       ready, waiting for its functional unit (or for the load/store queue)
+#   execute    in the functional unit
+#   writeBack  finished, waiting for a common data bus
+#   commit     written back, waiting for the older instructions to commit
+# and the cycles in which nothing committed to the instruction at the ROB head. Only timestamps are taken as the
+# instruction moves, the stage cycles are added up when it commits.
+class Profiler:
+    def __init__(self):
+        # PC -> [instruction, committed count, cycles per PROFILE_COLUMNS]
+        self.pcs = {}
+
+    def entry(self, pc, instruction):
+        record = self.pcs.get(pc)
+        if record is None:
+            record = self.pcs[pc] = [instruction, 0] + [0] * len(PROFILE_COLUMNS)
+        return record
+
+    def issue(self, robEntry, decodeCycle, ready, cycle):
+        robEntry.times = [decodeCycle, cycle, cycle if ready else None, None, None]
+
+    # Instructions issued before profiling started, in a restored checkpoint, have no timestamps and are not charged
+    def ready(self, robEntry, cycle):
+        if robEntry.times is not None:
+            robEntry.times[READY] = cycle
+
+    def complete(self, robEntry, cycle):
+        if robEntry.times is not None:
+            robEntry.times[COMPLETE] = cycle
+
+    def broadcast(self, robEntry, cycle):
+        if robEntry.times is not None:
+            robEntry.times[BROADCAST] = cycle
+
+    def commit(self, robEntry, latency, cycle):
+        if robEntry.times is None:
+            return
+        decode, issue, ready, complete, broadcast = robEntry.times
+        start = complete - latency + 1
+        record = self.entry(robEntry.pc, robEntry.inst)
+        record[1] += 1
+        record[2] += issue - decode
+        record[3] += ready - issue
+        record[4] += start - ready
+        record[5] += latency
+        record[6] += broadcast - complete
+        record[7] += cycle - broadcast
+
+    def headBlocked(self, robEntry, cycles=1):
+        self.entry(robEntry.pc, robEntry.inst)[8] += cycles
+
+    # (pc, instruction, committed, total cycles, cycles per PROFILE_STAGES, headBlocked cycles), the most expensive
+    # first. Head-blocked cycles are also stage cycles of the same instruction, so they stay out of the total.
+    def rows(self):
+        rows = []
+        stages = len(PROFILE_STAGES)
+        for pc, record in self.pcs.items():
+            cycles = record[2:2 + stages]
+            rows.append((pc, record[0], record[1], sum(cycles), cycles, record[2 + stages]))
+        rows.sort(key=lambda row: (-row[3], row[0]))
+        return rows
+
+    def report(self):
+        lines = [f"{'PC':>6}  {'count':>7}  {'total':>9}  " + "  ".join(f"{column:>11}" for column in PROFILE_STAGES)
+                 + f"  | {'headBlocked':>11}  instruction"]
+        for pc, instruction, count, total, cycles, headBlocked in self.rows():
+            lines.append(f"{pc:>6}  {count:>7}  {total:>9}  " + "  ".join(f"{value:>11}" for value in cycles)
+                         + f"  | {headBlocked:>11}  {instruction}")
+        return "\n".join(lines) + "\n"
+
+    # One "pc: instruction;stage cycles" line per non-zero stage, the folded-stack input of flame graph tools. The
+    # head-blocked cycles are left out, the stages already hold them.
+    def folded(self):
+        lines = []
+        for pc, instruction, count, total, cycles, headBlocked in self.rows():
+            for column, value in zip(PROFILE_STAGES, cycles):
+                if value:
+                    lines.append(f"{pc}: {instruction};{column} {value}")
+        return "\n".join(lines) + "\n"
+
+    def save(self, reportFile=None, foldedFile=None):
+        if reportFile is not None:
+            with open(reportFile, "w") as f:
+                f.write(self.report())
+        if foldedFile is not None:
+            with open(foldedFile, "w") as f:
+                f.write(self.folded())
@@ -1,59 +1,100 @@
-class Register:
-    def __init__(self, name):
-        self.name = name
-        self.value = 0
-        self.rename = None
-        self.busy = False
+# Physical registers are integer indices, shown as "pN" in logs; immediates stay strings
+def registerName(register):
+    return "p" + str(register) if isinstance(register, int) else register
 
-    def __str__(self):
-        return f"{self.busy}, {self.value}, {self.rename}"
+
+# ROB entries are tagged by their integer index, shown as "ROBn" in logs
+def robName(tag):
+    return "ROB" + str(tag) if tag is not None else tag
 
 
 class RegisterFile:
-    def __init__(self, NR):
-        self.registers = {}
-        for i in range(NR):
-            rName = "p" + str(i)
-            self.registers[rName] = Register(rName)
+    def __init__(self, NP):
+        self.size = NP
+        self.values = [0] * NP
+        self.busy = [False] * NP
+        self.renames = [None] * NP
+        # Reverse map from ROB tag to the physical register it will write
+        self.robRegisters = {}
 
     def __str__(self):
         string = ""
-        for key, value in self.registers.items():
-            string += f"'{key}': [{str(value)}], "
+        for i in range(self.size):
+            string += f"'{registerName(i)}': [{self.busy[i]}, {self.values[i]}, {robName(self.renames[i])}], "
         return "{"+string+"}"
 
+    def renameRegister(self, register, rob):
+        self.renames[register] = rob
+        self.busy[register] = True
+        self.robRegisters[rob] = register
+
+    def clearRename(self, register):
+        rob = self.renames[register]
+        if self.robRegisters.get(rob) == register:
+            del self.robRegisters[rob]
+        self.renames[register] = None
+
     def getROBRegister(self, rob):
-        for key, value in self.registers.items():
-            if value.rename == rob:
-                return value
-        return None
+        return self.robRegisters.get(rob)
 
 
+# Circular free list: registers are taken at the head and returned at the tail. Both positions count up from the
+# start, so the head position recorded when an instruction was renamed still identifies every register allocated
+# after it, and moving the head back frees them all at once. Frees only ever return registers allocated before
+# any instruction still in flight, so they never overwrite those.
 class FreeRegisterTable:
-    def __init__(self, registers):
-        self.freeRegisters = registers if registers else []
+    def __init__(self, count):
+        self.size = count
+        self.registers = list(range(count))
+        self.head = 0
+        self.tail = count
+
+    def __str__(self):
+        return str([registerName(self.registers[i % self.size]) for i in range(self.head, self.tail)])
+
+    def __len__(self):
+        return self.tail - self.head
 
     def isAvailable(self):
-        if len(self.freeRegisters) == 0:
+        if self.head == self.tail:
             return None
-        else:
-            return self.freeRegisters.pop(0)
+        register = self.registers[self.head % self.size]
+        self.head += 1
+        return register
 
     def addRegister(self, register):
-        if register not in self.freeRegisters:
-            self.freeRegisters.append(register)
+        self.registers[self.tail % self.size] = register
+        self.tail += 1
 
+    # Free every register allocated since the head was at this position
+    def restore(self, head):
+        self.head = head
 
+
+# Architectural register -> physical register of its newest value, as renamed so far (speculative) and as of the
+# last committed instruction. A branch saves a copy of the speculative map, which recovering from it puts back.
 class RegisterMappingTable:
     def __init__(self):
         self.mappingTable = {}
+        self.committed = {}
+
+    def __str__(self):
+        return str({key: registerName(value) for key, value in self.mappingTable.items()})
 
     def registerRenaming(self, instructionRegister, physicalRegister):
-        if instructionRegister in self.mappingTable:
-            self.mappingTable[instructionRegister].append(physicalRegister)
-        else:
-            self.mappingTable[instructionRegister] = [physicalRegister]
+        self.mappingTable[instructionRegister] = physicalRegister
 
     def isAlreadyMapped(self, register):
-        mappedRegisters = self.mappingTable.get(register)
-        return mappedRegisters[-1] if mappedRegisters is not None else mappedRegisters
+        return self.mappingTable.get(register)
+
+    # Make a mapping architectural, returning the register the architectural register held before
+    def commitMapping(self, instructionRegister, physicalRegister):
+        previous = self.committed.get(instructionRegister)
+        self.committed[instructionRegister] = physicalRegister
+        return previous
+
+    def snapshot(self):
+        return dict(self.mappingTable)
+
+    def restore(self, mapping):
+        self.mappingTable = dict(mapping)
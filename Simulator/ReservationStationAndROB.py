@@ -1,78 +1,148 @@
+import heapq
+from Simulator.RegisterHandler import registerName, robName
+
+
 class FunctionalUnit:
-    def __init__(self, name, latency):
+    def __init__(self, name, latency, interval=None, count=1, timingOnly=False):
         self.name = name
-        self.executionEntry = None
         self.latency = latency
-        self.isBusy = False
-        self.coolDown = 0
-
-    def executeNewEntry(self, entry, reorderBuffer, registerFile, mainMemory):
-        self.coolDown = 0
-        self.executionEntry = entry
-        self.isBusy = True
-        return self.execute(reorderBuffer, registerFile, mainMemory)
-
-    def executeAlreadyExistingEntry(self, reorderBuffer, registerFile, mainMemory):
-        return self.execute(reorderBuffer, registerFile, mainMemory)
+        # Cycles between two operations starting on one copy of the unit, the latency unless the unit is pipelined
+        self.interval = interval or latency
+        self.count = count
+        # Only the timing is modelled: no values are computed, addresses and branch outcomes come from the trace
+        self.timingOnly = timingOnly
+        # Operations in execution, in the order they started, as [RS entry, cycles executed, copy]
+        self.executing = []
+        # Cycles until each copy can start another operation
+        self.wait = [0] * count
+        # Whether the unit was already counted busy this cycle
+        self.active = False
+        self.busyCycles = 0
+
+    # Copies that can start an operation this cycle
+    def freeCopies(self):
+        return self.wait.count(0)
+
+    # Squash the operations of instructions younger than instId, a copy left with none is free at once. Busy cycles
+    # keep accumulating over the whole run
+    def flushAfter(self, instId):
+        executing = [operation for operation in self.executing if operation[0].instId <= instId]
+        if len(executing) < len(self.executing):
+            occupied = set(operation[2] for operation in executing)
+            for copy in range(self.count):
+                if copy not in occupied:
+                    self.wait[copy] = 0
+            self.executing = executing
+
+    # Move every operation in execution one cycle on, returning the RS entries that finished
+    def advance(self, reorderBuffer, registerFile, mainMemory):
+        for copy in range(self.count):
+            if self.wait[copy]:
+                self.wait[copy] -= 1
+        self.active = bool(self.executing)
+        if not self.active:
+            return []
+        self.busyCycles += 1
+        finished = []
+        for operation in self.executing:
+            operation[1] += 1
+            if operation[1] == self.latency:
+                finished.append(operation)
+            else:
+                self.markExecuting(operation[0], reorderBuffer)
+        for operation in finished:
+            self.executing.remove(operation)
+            self.complete(operation[0], reorderBuffer, registerFile, mainMemory)
+        return [operation[0] for operation in finished]
+
+    # Start an RS entry on a free copy, returning whether it already finished
+    def start(self, entry, reorderBuffer, registerFile, mainMemory):
+        copy = self.wait.index(0)
+        self.wait[copy] = self.interval
+        if not self.active:
+            self.active = True
+            self.busyCycles += 1
+        if self.latency == 1:
+            self.complete(entry, reorderBuffer, registerFile, mainMemory)
+            return True
+        self.executing.append([entry, 1, copy])
+        self.markExecuting(entry, reorderBuffer)
+        return False
 
-    def execute(self, reorderBuffer, registerFile, mainMemory):
-        self.coolDown += 1
-        if self.coolDown == self.latency:
-            # Updating the destination Register
-            entry = self.executionEntry
-            dest = entry.dest
-            destinationRegister = registerFile.getROBRegister(dest)
-            result = None
-            if entry.op == "add":
-                result = int(registerFile.registers[entry.vj].value) + int(registerFile.registers[entry.vk].value)
-            elif entry.op == "addi":
-                result = int(registerFile.registers[entry.vj].value) + int(entry.vk)
-            elif entry.op == "fld":
-                address = int(entry.vj) + int(registerFile.registers[entry.vk].value)
+    # Jump over cycles in which no operation finishes
+    def skip(self, cycles):
+        for copy in range(self.count):
+            self.wait[copy] = max(self.wait[copy] - cycles, 0)
+        if self.executing:
+            for operation in self.executing:
+                operation[1] += cycles
+            self.busyCycles += cycles
+
+    # Cycles that can pass before an operation finishes or, with entries waiting, before a copy can take one
+    def quietCycles(self, waiting):
+        cycles = None
+        if self.executing:
+            cycles = self.latency - max(operation[1] for operation in self.executing) - 1
+        if waiting:
+            free = max(min(self.wait) - 1, 0)
+            cycles = free if cycles is None else min(cycles, free)
+        return cycles
+
+    def markExecuting(self, entry, reorderBuffer):
+        robEntry = reorderBuffer.entries[entry.dest]
+        robEntry.ready = False
+        robEntry.state = "Executing"
+
+    def complete(self, entry, reorderBuffer, registerFile, mainMemory):
+        # Updating the destination Register
+        robEntry = reorderBuffer.entries[entry.dest]
+        result = None
+        if self.timingOnly:
+            if entry.op == "fsd":
+                robEntry.dest = entry.address
+            elif entry.op == "bne" and entry.taken:
+                result = robEntry.dest
+        elif entry.op == "add":
+            result = int(registerFile.values[entry.vj]) + int(registerFile.values[entry.vk])
+        elif entry.op == "addi":
+            result = int(registerFile.values[entry.vj]) + int(entry.vk)
+        elif entry.op == "fld":
+            if entry.forwarded:
+                result = entry.forwardedValue
+            else:
+                address = int(entry.vj) + int(registerFile.values[entry.vk])
                 result = mainMemory[address]
-            elif entry.op == "fsd":
-                robEntry = reorderBuffer.getROBWithName(dest)
-                offset = robEntry.dest
-                address = int(registerFile.registers[entry.vk].value) + int(offset)
-                robEntry.dest = address
-                result = registerFile.registers[entry.vj].value
-            elif entry.op == "fadd":
-                result = float(registerFile.registers[entry.vj].value) + float(registerFile.registers[entry.vk].value)
-            elif entry.op == "fsub":
-                result = float(registerFile.registers[entry.vj].value) - float(registerFile.registers[entry.vk].value)
-            elif entry.op == "fmul":
-                result = float(registerFile.registers[entry.vj].value) * float(registerFile.registers[entry.vk].value)
-            elif entry.op == "fdiv":
-                result = float(registerFile.registers[entry.vj].value) / float(registerFile.registers[entry.vk].value)
-            elif entry.op == "bne":
-                robEntry = reorderBuffer.getROBWithName(dest)
-                value1 = float(registerFile.registers[entry.vj].value)
-                value2 = float(registerFile.registers[entry.vk].value)
-                if value1 != value2:
-                    result = robEntry.dest
-                else:
-                    result = None
-            if entry.op not in ["bne", "fsd"]:
-                destinationRegister.value = result
-            # Update ROB Table for being ready to commit and also for value
-            robEntry = reorderBuffer.getROBWithName(dest)
-            robEntry.ready = True
-            robEntry.value = result
-            robEntry.state = "Execution Complete"
-            self.executionEntry = None
-            self.isBusy = False
-            return True, entry
-        else:
-            entry = self.executionEntry
-            dest = entry.dest
-            robEntry = reorderBuffer.getROBWithName(dest)
-            robEntry.ready = False
-            robEntry.state = "Executing"
-            return False, None
+        elif entry.op == "fsd":
+            offset = robEntry.dest
+            address = int(registerFile.values[entry.vk]) + int(offset)
+            robEntry.dest = address
+            result = registerFile.values[entry.vj]
+        elif entry.op == "fadd":
+            result = float(registerFile.values[entry.vj]) + float(registerFile.values[entry.vk])
+        elif entry.op == "fsub":
+            result = float(registerFile.values[entry.vj]) - float(registerFile.values[entry.vk])
+        elif entry.op == "fmul":
+            result = float(registerFile.values[entry.vj]) * float(registerFile.values[entry.vk])
+        elif entry.op == "fdiv":
+            result = float(registerFile.values[entry.vj]) / float(registerFile.values[entry.vk])
+        elif entry.op == "bne":
+            value1 = float(registerFile.values[entry.vj])
+            value2 = float(registerFile.values[entry.vk])
+            if value1 != value2:
+                result = robEntry.dest
+            else:
+                result = None
+        if entry.op not in ["bne", "fsd"]:
+            registerFile.values[registerFile.getROBRegister(entry.dest)] = result
+        # Update ROB Table for being ready to commit and also for value
+        reorderBuffer.completeEntry(robEntry, result)
 
 
 class ReservationStationEntry:
-    def __init__(self, latency):
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
         self.instId = None
         self.instruction = None
         self.op = None
@@ -82,15 +152,16 @@ class ReservationStationEntry:
         self.qk = None
         self.dest = None
         self.busy = False
-        self.coolDown = latency
         self.ready = False
+        # Loads: value forwarded from an older store by the load/store queue
+        self.forwarded = False
+        self.forwardedValue = None
+        # Trace-driven runs: effective address and branch outcome recorded in the trace
+        self.address = None
+        self.taken = None
 
     def __str__(self):
-        return f"|{self.busy}|instr_id={self.instId}|instr=[{self.instruction}]|op={self.op}|vj={self.vj} |vk={self.vk} |qj={self.qj} |qk={self.qk} |dest={self.dest}|"
-
-    def execute(self):
-        self.coolDown -= 1
-        return self.coolDown
+        return f"|{self.busy}|instr_id={self.instId}|instr=[{self.instruction}]|op={self.op}|vj={registerName(self.vj)} |vk={registerName(self.vk)} |qj={robName(self.qj)} |qk={robName(self.qk)} |dest={robName(self.dest)}|"
 
 
 class ReservationStation:
@@ -99,11 +170,11 @@ class ReservationStation:
         self.Name = name
         self.instructions = instructions
         self.latency = latency
-        self.entries = [ReservationStationEntry(latency) for i in range(count)]
-        self.executeFlag = False
-        self.executingEntry = None
+        self.entries = [ReservationStationEntry() for i in range(count)]
         self.functionalUnit = functionalUnit
-        self.ready = False
+        self.occupancy = 0
+        # Heap of (instruction id, entry) for entries whose operands are all available
+        self.readyEntries = []
 
     def __str__(self):
         string = ""
@@ -117,83 +188,91 @@ class ReservationStation:
                 return True
         return False
 
+    # Free a finished entry, recycling it at the end of the slot order
     def removeEntry(self, entry):
         self.entries.remove(entry)
-        self.entries.append(ReservationStationEntry(self.latency))
+        self.occupancy -= 1
+        entry.reset()
+        self.entries.append(entry)
 
-    def getReadyEntry(self):
+    # Squash the entries of instructions younger than instId in place, the older ones keep their state
+    def flushAfter(self, instId):
+        squashed = False
         for entry in self.entries:
-            if entry.busy and entry.ready:
-                return entry
+            if entry.busy and entry.instId > instId:
+                entry.reset()
+                self.occupancy -= 1
+                squashed = True
+        if squashed:
+            self.readyEntries = [item for item in self.readyEntries if item[0] <= instId]
+            heapq.heapify(self.readyEntries)
+
+    def markReady(self, entry):
+        entry.ready = True
+        heapq.heappush(self.readyEntries, (entry.instId, entry))
+
+    # Oldest ready entry first, which is also the first ready entry in slot order
+    def getReadyEntry(self):
+        if self.readyEntries:
+            return heapq.heappop(self.readyEntries)[1]
         return None
 
-    def updateEntriesWithCommonDataBus(self, commonDataBus, reorderBuffer, registerFile, registerMappingTable):
-        for entry in self.entries:
-            for data in commonDataBus:
-                if entry.qj is not None:
-                    if data[0] == entry.qj:
-                        entry.qj = None
-                        entry.vj = data[1]
-                if entry.qk is not None:
-                    if data[0] == entry.qk:
-                        entry.qk = None
-                        entry.vk = data[1]
-            if entry.busy and entry.qj is None and entry.qk is None:
-                entry.ready = True
-            if entry.busy and entry.qj is not None and entry.qk is not None:
-                rob = reorderBuffer.getROBWithName(entry.qj)
-                if entry.qj is not None:
-                    if rob.state == "Commit":
-                        entry.vj = registerMappingTable[rob.dest][0]
-                rob = reorderBuffer.getROBWithName(entry.qk)
-                if entry.qk is not None:
-                    if rob.state == "Commit":
-                        entry.vk = registerMappingTable[rob.dest][0]
-
-    def execute(self, commonDataBus, reorderBuffer, registerFile, mainMemory, registerMappingTable):
-        # Update Reservation Station Entries With Common Data Bus Data
-        self.updateEntriesWithCommonDataBus(commonDataBus, reorderBuffer, registerFile, registerMappingTable)
+    # Take a given ready entry, for selection that may pass over older ones
+    def takeReadyEntry(self, entry):
+        self.readyEntries.remove((entry.instId, entry))
+        heapq.heapify(self.readyEntries)
+
+    # Returns the instruction ids of the entries that started execution this cycle, oldest first
+    def execute(self, reorderBuffer, registerFile, mainMemory):
         fUnit = self.functionalUnit
-        # Check if fUnit is busy: If Yes Execute Already Existing Instruction
-        if fUnit.isBusy:
-            finished, entry = fUnit.executeAlreadyExistingEntry(reorderBuffer, registerFile, mainMemory)
-            if finished:
-                self.removeEntry(entry)
-        # If No Pick an Entry and Start Execution
-        else:
+        # Operations already in execution move on, then the oldest ready entries start on the free copies
+        for entry in fUnit.advance(reorderBuffer, registerFile, mainMemory):
+            self.removeEntry(entry)
+        started = []
+        for i in range(fUnit.freeCopies()):
             entry = self.getReadyEntry()
-            if entry is not None:
-                finished, entry = fUnit.executeNewEntry(entry, reorderBuffer, registerFile, mainMemory)
-                if finished:
-                    self.removeEntry(entry)
+            if entry is None:
+                break
+            started.append(entry.instId)
+            if fUnit.start(entry, reorderBuffer, registerFile, mainMemory):
+                self.removeEntry(entry)
+        return started
 
 
 class ReservationStationUnity:
-    def __init__(self):
-        self.intRS = ReservationStation("INT", 4, ["add", "addi"], 1, FunctionalUnit("INT", 1))
-        loadStoreUnit = FunctionalUnit("LoadStore", 1)
-        self.loadBuffer = ReservationStation("Load", 2, ["fld"], 1, loadStoreUnit)
-        self.storeBuffer = ReservationStation("Store", 2, ["fsd"], 3, loadStoreUnit)
-        self.fpAddRS = ReservationStation("FPadd", 3, ["fadd", "fsub"], 4, FunctionalUnit("FPadd", 3))
-        self.fpMultRS = ReservationStation("FPmult", 4, ["fmul"], 8, FunctionalUnit("FPmult", 4))
-        self.fpDivRS = ReservationStation("FPdiv", 2, ["fdiv"], 8, FunctionalUnit("FPdiv", 8))
-        self.BU = ReservationStation("BU", 1, ["bne"], 1, FunctionalUnit("BU", 1))
-        self.Stations = {
-            "add": self.intRS,
-            "addi": self.intRS,
-            "fld": self.loadBuffer,
-            "fsd": self.storeBuffer,
-            "fadd": self.fpAddRS,
-            "fsub": self.fpAddRS,
-            "fmul": self.fpMultRS,
-            "fdiv": self.fpDivRS,
-            "bne": self.BU
-        }
+    # Stations and functional units are built once from the machine description and reset in place on flush
+    def __init__(self, machine, loadStoreQueue, timingOnly=False):
+        units = {name: FunctionalUnit(name, unit["latency"], unit.get("interval"), unit.get("count", 1), timingOnly)
+                 for name, unit in machine["units"].items()}
+        self.stationList = []
+        self.Stations = {}
+        for station in machine["stations"]:
+            unit = units[station["unit"]]
+            reservationStation = ReservationStation(station["name"], station["entries"], station["ops"], unit.latency,
+                                                    unit)
+            self.stationList.append(reservationStation)
+            for op in station["ops"]:
+                self.Stations[op] = reservationStation
+        self.loadBuffer = self.Stations["fld"]
+        self.storeBuffer = self.Stations["fsd"]
+        self.loadStoreQueue = loadStoreQueue
+        # Groups of stations executed together: loads and stores sharing one unit are selected between by age
+        self.memoryStations = list(dict.fromkeys([self.loadBuffer, self.storeBuffer]))
+        self.executionOrder = []
+        for station in self.stationList:
+            if station in self.memoryStations:
+                group = [memoryStation for memoryStation in self.memoryStations
+                         if memoryStation.functionalUnit is station.functionalUnit]
+                if group not in self.executionOrder:
+                    self.executionOrder.append(group)
+            else:
+                self.executionOrder.append([station])
+        self.waiters = {}
 
     def __str__(self):
         string = "              RESERVATION STATUS TABLE\n"
-        for unit in ["add", "fld", "fsd", "fadd", "fmul", "fdiv", "bne"]:
-            string += f"{str(self.Stations[unit])}"
+        for station in self.stationList:
+            string += f"{str(station)}"
         return string
 
     def isAvailable(self, op):
@@ -207,68 +286,102 @@ class ReservationStationUnity:
         unit = self.Stations[op]
         for entry in unit.entries:
             if not entry.busy:
+                entry.busy = True
+                unit.occupancy += 1
                 return entry
         return None
 
-    def loadStoreExecute(self, commonDataBus, reorderBuffer, registerFile, mainMemory, registerMappingTable):
-        self.storeBuffer.updateEntriesWithCommonDataBus(commonDataBus, reorderBuffer, registerFile,
-                                                        registerMappingTable)
-        self.loadBuffer.updateEntriesWithCommonDataBus(commonDataBus, reorderBuffer, registerFile, registerMappingTable)
-        store1, store2, load1, load2 = self.storeBuffer.entries[0], self.storeBuffer.entries[1], \
-                                       self.loadBuffer.entries[0], self.loadBuffer.entries[1]
-        if store1.ready and load1.ready:
-            if int(store1.dest[-1]) > int(load1.dest[-1]):
-                self.loadBuffer.execute(commonDataBus, reorderBuffer, registerFile, mainMemory, registerMappingTable)
-            else:
-                self.storeBuffer.execute(commonDataBus, reorderBuffer, registerFile, mainMemory, registerMappingTable)
-        elif not store1.ready and not load1.ready:
-            if store2.ready and load2.ready:
-                if int(store2.dest[-1]) > int(load2.dest[-1]):
-                    self.loadBuffer.execute(commonDataBus, reorderBuffer, registerFile, mainMemory,
-                                            registerMappingTable)
+    # Hook a freshly issued RS entry into the wakeup lists of the ROB tags it waits on
+    def issueEntry(self, op, entry):
+        station = self.Stations[op]
+        if entry.qj is not None:
+            self.waiters.setdefault(entry.qj, []).append((station, entry, True))
+        if entry.qk is not None:
+            self.waiters.setdefault(entry.qk, []).append((station, entry, False))
+        if entry.qj is None and entry.qk is None:
+            station.markReady(entry)
+
+    # Wake only the RS operand slots waiting on the broadcast ROB tags, returning the entries that became ready
+    def wakeup(self, commonDataBus):
+        woken = []
+        for tag, register in commonDataBus:
+            consumers = self.waiters.pop(tag, None)
+            if consumers is None:
+                continue
+            for station, entry, isJ in consumers:
+                if isJ:
+                    entry.qj = None
+                    entry.vj = register
                 else:
-                    self.storeBuffer.execute(commonDataBus, reorderBuffer, registerFile, mainMemory,
-                                             registerMappingTable)
+                    entry.qk = None
+                    entry.vk = register
+                if entry.qj is None and entry.qk is None:
+                    station.markReady(entry)
+                    woken.append(entry)
+        return woken
+
+    # Oldest ready loads or stores of the stations that the load/store queue lets execute, up to count of them
+    def selectMemoryEntries(self, stations, count):
+        selected = []
+        for instId, entry in sorted(item for station in stations for item in station.readyEntries):
+            if len(selected) == count:
+                break
+            if self.loadStoreQueue.canExecute(entry):
+                self.Stations[entry.op].takeReadyEntry(entry)
+                self.loadStoreQueue.started(entry)
+                selected.append(entry)
+        return selected
+
+    def memoryExecute(self, stations, reorderBuffer, registerFile, mainMemory):
+        fUnit = stations[0].functionalUnit
+        for entry in fUnit.advance(reorderBuffer, registerFile, mainMemory):
+            self.Stations[entry.op].removeEntry(entry)
+        started = []
+        if fUnit.freeCopies():
+            for entry in self.selectMemoryEntries(stations, fUnit.freeCopies()):
+                started.append(entry.instId)
+                if fUnit.start(entry, reorderBuffer, registerFile, mainMemory):
+                    self.Stations[entry.op].removeEntry(entry)
+        return started
+
+    # Execute every station group, returning the instruction ids of the entries that started execution
+    def execute(self, reorderBuffer, registerFile, mainMemory):
+        self.loadStoreQueue.resolve(registerFile)
+        started = []
+        for stations in self.executionOrder:
+            if stations[0] in self.memoryStations:
+                started += self.memoryExecute(stations, reorderBuffer, registerFile, mainMemory)
             else:
-                return
-        elif not store1.ready:
-            self.loadBuffer.execute(commonDataBus, reorderBuffer, registerFile, mainMemory, registerMappingTable)
-        else:
-            self.storeBuffer.execute(commonDataBus, reorderBuffer, registerFile, mainMemory, registerMappingTable)
-
-    def execute(self, commonDataBus, reorderBuffer, registerFile, mainMemory, registerMappingTable):
-        self.intRS.execute(commonDataBus, reorderBuffer, registerFile, mainMemory, registerMappingTable)
-        self.loadStoreExecute(commonDataBus, reorderBuffer, registerFile, mainMemory, registerMappingTable)
-        self.fpAddRS.execute(commonDataBus, reorderBuffer, registerFile, mainMemory, registerMappingTable)
-        self.fpMultRS.execute(commonDataBus, reorderBuffer, registerFile, mainMemory, registerMappingTable)
-        self.fpDivRS.execute(commonDataBus, reorderBuffer, registerFile, mainMemory, registerMappingTable)
-        self.BU.execute(commonDataBus, reorderBuffer, registerFile, mainMemory, registerMappingTable)
-
-    def flush(self):
-        self.intRS = ReservationStation("INT", 4, ["add", "addi"], 1, FunctionalUnit("INT", 1))
-        loadStoreUnit = FunctionalUnit("LoadStore", 1)
-        self.loadBuffer = ReservationStation("Load", 2, ["fld"], 1, loadStoreUnit)
-        self.storeBuffer = ReservationStation("Store", 2, ["fsd"], 3, loadStoreUnit)
-        self.fpAddRS = ReservationStation("FPadd", 3, ["fadd", "fsub"], 4, FunctionalUnit("FPadd", 3))
-        self.fpMultRS = ReservationStation("FPmult", 4, ["fmul"], 8, FunctionalUnit("FPmult", 4))
-        self.fpDivRS = ReservationStation("FPdiv", 2, ["fdiv"], 8, FunctionalUnit("FPdiv", 8))
-        self.BU = ReservationStation("BU", 1, ["bne"], 1, FunctionalUnit("BU", 1))
-        self.Stations = {
-            "add": self.intRS,
-            "addi": self.intRS,
-            "fld": self.loadBuffer,
-            "fsd": self.storeBuffer,
-            "fadd": self.fpAddRS,
-            "fsub": self.fpAddRS,
-            "fmul": self.fpMultRS,
-            "fdiv": self.fpDivRS,
-            "bne": self.BU
-        }
+                started += stations[0].execute(reorderBuffer, registerFile, mainMemory)
+        return started
+
+    # Squash the instructions younger than instId, dropping their wakeups
+    def flushAfter(self, instId):
+        # Units first: squashed RS entries are reset in place and lose their instruction ids
+        for unit in self.functionalUnits():
+            unit.flushAfter(instId)
+        for station in self.stationList:
+            station.flushAfter(instId)
+        waiters = {}
+        for tag, consumers in self.waiters.items():
+            consumers = [consumer for consumer in consumers if consumer[1].busy]
+            if consumers:
+                waiters[tag] = consumers
+        self.waiters = waiters
+        self.loadStoreQueue.flushAfter(instId)
+
+    def functionalUnits(self):
+        return list(dict.fromkeys(station.functionalUnit for station in self.stationList))
+
+    # Busy cycles per functional unit over the whole run
+    def getUnitBusyCycles(self):
+        return {unit.name: unit.busyCycles for unit in self.functionalUnits()}
 
 
 class ReorderBufferEntry:
-    def __init__(self, name):
-        self.name = name
+    def __init__(self, tag):
+        self.tag = tag
+        self.name = robName(tag)
         self.inst_id = None
         self.state = None
         self.dest = None
@@ -276,18 +389,35 @@ class ReorderBufferEntry:
         self.RR = None
         self.busy = False
         self.inst = None
+        self.pc = None
+        self.op = None
+        self.predictedTaken = None
         self.ready = False
+        # Profiler timestamps of the instruction's stages
+        self.times = None
+        # Registers the instruction allocated to sources never written before, as (architectural, physical)
+        self.allocated = []
+        # Free list head after the instruction was renamed, and for branches the rename map right after it
+        self.freeHead = None
+        self.snapshot = None
+        # Branch predictor history before the instruction, restored by a flush after it
+        self.history = None
+        # Branch resolved against its prediction, the flush already happened
+        self.mispredicted = False
 
     def __str__(self):
-        return f"inst_id:{self.inst_id}|name={self.name}|busy={self.busy}|inst='{self.inst}'|dest={self.dest}|rr={self.RR}|state={self.state}|\n"
+        return f"inst_id:{self.inst_id}|name={self.name}|busy={self.busy}|inst='{self.inst}'|dest={self.dest}|rr={registerName(self.RR)}|state={self.state}|\n"
 
 
 class ReorderBuffer:
     def __init__(self, count):
         self.head = 0
         self.tail = 0
-        self.entries = [ReorderBufferEntry("ROB" + str(i)) for i in range(count)]
+        self.count = 0
+        self.entries = [ReorderBufferEntry(i) for i in range(count)]
         self.size = count
+        # Tags of entries that finished execution and still have to go through write back
+        self.completed = set()
 
     def __str__(self):
         string = f"         Head: {self.head} || Tail: {self.tail}\n"
@@ -299,34 +429,61 @@ class ReorderBuffer:
         if self.tail + 1 == self.head:
             return False
         else:
-            if self.tail + 1 >= len(self.entries):
+            if self.tail + 1 >= self.size:
                 if self.head == 0:
                     return False
             return True
 
     def getROB(self):
         tail = self.tail
-        self.tail = 0 if self.tail + 1 >= len(self.entries) else self.tail + 1
-        return self.entries[tail] if not self.entries[tail].busy else False
-
-    def getROBWithName(self, name):
-        for entry in self.entries:
-            if entry.name == name:
-                return entry
-        return None
-
+        self.tail = 0 if self.tail + 1 >= self.size else self.tail + 1
+        robEntry = self.entries[tail]
+        if robEntry.busy:
+            return False
+        robEntry.busy = True
+        self.count += 1
+        return robEntry
+
+    # Free an entry, keeping the count of busy entries in step
+    def releaseEntry(self, robEntry):
+        if robEntry.busy:
+            robEntry.busy = False
+            self.count -= 1
+
+    def completeEntry(self, robEntry, value):
+        robEntry.ready = True
+        robEntry.value = value
+        robEntry.state = "Execution Complete"
+        self.completed.add(robEntry.tag)
+
+    # Head entry once it is written back; squashed entries left behind a flush are never retired
     def commitHead(self):
         robHead = self.entries[self.head]
-        if robHead.state == "WriteBack":
+        if robHead.busy and robHead.state == "WriteBack":
             return robHead
         else:
             return None
 
     def updateHead(self):
-        self.head = 0 if self.head + 1 == len(self.entries) else self.head + 1
+        self.head = 0 if self.head + 1 == self.size else self.head + 1
+
+    # Squash every entry younger than robEntry, returning them youngest first
+    def flushAfter(self, robEntry):
+        squashed = []
+        last = robEntry.tag
+        tail = self.tail - 1 if self.tail > 0 else self.size - 1
+        while tail != last:
+            squashedEntry = self.entries[tail]
+            self.releaseEntry(squashedEntry)
+            self.completed.discard(tail)
+            squashed.append(squashedEntry)
+            tail = tail - 1 if tail > 0 else self.size - 1
+        self.tail = 0 if last + 1 >= self.size else last + 1
+        return squashed
+
+    # Entries older than robEntry
+    def distance(self, robEntry):
+        return (robEntry.tag - self.head) % self.size
 
     def isEmpty(self):
-        for entry in self.entries:
-            if entry.busy:
-                return False
-        return True
+        return self.count == 0
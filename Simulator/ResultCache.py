@@ -0,0 +1,95 @@
+import glob
+import hashlib
+import json
+import os
+import pickle
+import zlib
+
+# Outputs a cached result cannot give back: runs asking for any of them are always simulated
+UNCACHED_OUTPUTS = ["pipelineTrace", "profile", "profileFolded", "chromeTrace", "konata", "checkpointEvery",
+                    "checkpointPC"]
+
+simulatorVersion = None
+
+
+# Hash of the simulator's own source, so a changed simulator never returns results cached by an older one
+def getSimulatorVersion():
+    global simulatorVersion
+    if simulatorVersion is None:
+        hash = hashlib.sha256()
+        for fileName in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), "*.py"))):
+            with open(fileName, "rb") as f:
+                hash.update(f.read())
+        simulatorVersion = hash.hexdigest()
+    return simulatorVersion
+
+
+# A run whose only outputs are its statistics, registers and memory, which the cache holds
+def isCacheable(config):
+    if config.get("traceLevel", "full") != "none":
+        return False
+    return all(config.get(option) is None for option in UNCACHED_OUTPUTS)
+
+
+# Finished results on disk, one compressed file per run named by the hash of everything that decides the result:
+# the decoded program, the initial memory, the machine parameters and the simulator version. Reads refresh a file's
+# modification time and writes evict the least recently used files beyond maxBytes.
+class ResultCache:
+    def __init__(self, directory, maxBytes):
+        self.directory = directory
+        self.maxBytes = maxBytes
+
+    # model is the canonical machine configuration, Processor.getModelConfig, so run options never split entries
+    def key(self, program, memory, model):
+        hash = hashlib.sha256(getSimulatorVersion().encode())
+        for template in program.templates:
+            hash.update(repr((template.pc, template.op, template.d, template.s1, template.s2)).encode())
+        memory.digest(hash)
+        hash.update(json.dumps(model, sort_keys=True, default=str).encode())
+        return hash.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ".bin")
+
+    # The cached result, None on a miss or an unreadable file
+    def load(self, key):
+        fileName = self.path(key)
+        try:
+            with open(fileName, "rb") as f:
+                result = pickle.loads(zlib.decompress(f.read()))
+            os.utime(fileName)
+        except (OSError, zlib.error, pickle.UnpicklingError, EOFError):
+            return None
+        return result
+
+    # Written atomically, so concurrent runs never read half a file; a result larger than the cache is not kept
+    def store(self, key, result):
+        payload = zlib.compress(pickle.dumps(result, pickle.HIGHEST_PROTOCOL))
+        if len(payload) > self.maxBytes:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        fileName = self.path(key)
+        temporaryFile = f"{fileName}.{os.getpid()}.tmp"
+        with open(temporaryFile, "wb") as f:
+            f.write(payload)
+        os.replace(temporaryFile, fileName)
+        self.evict()
+
+    # Remove the least recently used results until the cache fits in maxBytes
+    def evict(self):
+        entries = []
+        for fileName in glob.glob(os.path.join(self.directory, "*.bin")):
+            try:
+                status = os.stat(fileName)
+            except OSError:
+                continue
+            entries.append((status.st_mtime, status.st_size, fileName))
+        total = sum(entry[1] for entry in entries)
+        for modified, size, fileName in sorted(entries):
+            if total <= self.maxBytes:
+                break
+            try:
+                os.remove(fileName)
+            except OSError:
+                pass
+            total -= size
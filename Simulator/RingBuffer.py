@@ -0,0 +1,51 @@
+# Fixed-capacity FIFO over a preallocated list: appends at the tail and removals at the head are O(1) and the queue
+# never grows past its capacity. Decode and issue look at the head first and only remove it once it moved on, so a
+# stall leaves the queue as it was.
+class RingBuffer:
+    def __init__(self, capacity):
+        if capacity < 1:
+            raise ValueError(f"queue capacity {capacity} must be at least 1")
+        self.capacity = capacity
+        self.entries = [None] * capacity
+        self.head = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    # Oldest first
+    def __iter__(self):
+        for i in range(self.count):
+            yield self.entries[(self.head + i) % self.capacity]
+
+    def __str__(self):
+        return str([str(entry) for entry in self])
+
+    def isFull(self):
+        return self.count == self.capacity
+
+    def space(self):
+        return self.capacity - self.count
+
+    def append(self, entry):
+        if self.count == self.capacity:
+            raise Exception("Queue full!")
+        self.entries[(self.head + self.count) % self.capacity] = entry
+        self.count += 1
+
+    def first(self):
+        return self.entries[self.head] if self.count else None
+
+    def popleft(self):
+        entry = self.entries[self.head]
+        self.entries[self.head] = None
+        self.head = (self.head + 1) % self.capacity
+        self.count -= 1
+        return entry
+
+    # Drop every entry, releasing them so a flushed queue holds no stale instructions
+    def clear(self):
+        for i in range(self.count):
+            self.entries[(self.head + i) % self.capacity] = None
+        self.head = 0
+        self.count = 0
@@ -0,0 +1,48 @@
+import copy
+from Simulator.BranchPredictor import BranchTargetBuffer, createPredictor
+from Simulator.FunctionalEmulator import FunctionalEmulator
+from Simulator.Memory import OverlayMemory
+from Simulator.Processor import Processor
+from Simulator.SimulationResult import SampledResult
+
+
+# Fast-forwards functionally and times a fixed-size interval in the detailed model every samplePeriod instructions
+class SampledSimulation:
+    def __init__(self, config, MainMemory, instructionFile):
+        self.config = dict(config, traceLevel="none", pipelineTrace=None)
+        self.instructionFile = instructionFile
+        self.period = config.get('samplePeriod', 1000)
+        # Instructions committed in the detailed model before measuring starts, to fill the pipeline
+        self.warmup = config.get('sampleWarmup', 100)
+        self.size = config.get('sampleSize', 100)
+        predictor = createPredictor(config.get('predictor', "1bit"), config.get('predictorEntries', 1024),
+                                    config.get('historyBits', 8))
+        BTB = BranchTargetBuffer(config.get('btbEntries', 16))
+        self.emulator = FunctionalEmulator(MainMemory, instructionFile, predictor, BTB)
+
+    # CPI of one detailed interval starting at the emulator's architectural state, None if nothing was measured
+    def measure(self):
+        emulator = self.emulator
+        # The interval's stores go to an overlay, the emulator's memory stays as it was
+        processor = Processor(self.config, OverlayMemory(emulator.MainMemory), self.instructionFile)
+        processor.loadArchitecturalState(emulator.PC, emulator.registers, copy.deepcopy(emulator.predictor),
+                                         copy.deepcopy(emulator.BTB))
+        counters = processor.counters
+        startCycle, startCount = (0, 0) if self.warmup == 0 else (None, None)
+        while not processor.finished and counters.instructions < self.warmup + self.size:
+            processor.step()
+            if startCycle is None and counters.instructions >= self.warmup:
+                startCycle, startCount = processor.cycle, counters.instructions
+        if startCycle is None or counters.instructions == startCount:
+            return None
+        return (processor.cycle - startCycle) / (counters.instructions - startCount)
+
+    def run(self):
+        samples = []
+        while True:
+            cpi = self.measure()
+            if cpi is not None:
+                samples.append(cpi)
+            if self.emulator.run(self.period) < self.period:
+                break
+        return SampledResult(self.config, self.emulator, samples)
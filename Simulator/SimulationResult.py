@@ -0,0 +1,265 @@
+import csv
+import io
+import json
+import math
+
+
+# Hardware performance counters, updated as the simulation runs
+class PerformanceCounters:
+    def __init__(self, NR, NB, sampleInterval=100):
+        self.sampleInterval = sampleInterval
+        self.committed = {}
+        self.instructions = 0
+        self.branches = 0
+        self.mispredictions = 0
+        self.mispredictionsByPC = {}
+        self.flushes = 0
+        self.squashed = 0
+        self.robOccupancy = [0] * (NR + 1)
+        self.cdbUsage = [0] * (NB + 1)
+        self.rsOccupancy = {}
+        # ROB occupancy and CDB usage averaged over every sampleInterval cycles
+        self.timeline = []
+        self.intervalRob = 0
+        self.intervalCdb = 0
+        self.intervalCycles = 0
+
+    def commitInstruction(self, op):
+        self.committed[op] = self.committed.get(op, 0) + 1
+        self.instructions += 1
+        if op == "bne":
+            self.branches += 1
+
+    def mispredictedBranch(self, pc):
+        self.mispredictions += 1
+        self.mispredictionsByPC[pc] = self.mispredictionsByPC.get(pc, 0) + 1
+
+    def branchFlush(self, squashed):
+        self.flushes += 1
+        self.squashed += squashed
+
+    def sampleCycle(self, cycle, robOccupancy, cdbUsage, stations):
+        self.robOccupancy[robOccupancy] += 1
+        self.cdbUsage[min(cdbUsage, len(self.cdbUsage) - 1)] += 1
+        for station in stations:
+            histogram = self.rsOccupancy.get(station.Name)
+            if histogram is None:
+                histogram = self.rsOccupancy[station.Name] = [0] * (len(station.entries) + 1)
+            histogram[station.occupancy] += 1
+        self.intervalRob += robOccupancy
+        self.intervalCdb += cdbUsage
+        self.intervalCycles += 1
+        if self.intervalCycles == self.sampleInterval:
+            self.closeInterval(cycle)
+
+    # Account a run of cycles in which the sampled values did not change
+    def sampleIdleCycles(self, cycle, cycles, robOccupancy, stations):
+        self.robOccupancy[robOccupancy] += cycles
+        self.cdbUsage[0] += cycles
+        for station in stations:
+            self.rsOccupancy[station.Name][station.occupancy] += cycles
+        while cycles > 0:
+            step = min(cycles, self.sampleInterval - self.intervalCycles)
+            self.intervalRob += robOccupancy * step
+            self.intervalCycles += step
+            cycle += step
+            cycles -= step
+            if self.intervalCycles == self.sampleInterval:
+                self.closeInterval(cycle - 1)
+
+    def closeInterval(self, cycle):
+        if self.intervalCycles == 0:
+            return
+        self.timeline.append({"cycle": cycle - self.intervalCycles + 1,
+                              "rob": self.intervalRob / self.intervalCycles,
+                              "cdb": self.intervalCdb / self.intervalCycles})
+        self.intervalRob = 0
+        self.intervalCdb = 0
+        self.intervalCycles = 0
+
+
+# JSON/CSV export shared by the result types, built on their toDict()
+class ResultFile:
+    # toDict() keys that only go to JSON
+    rowExclude = []
+
+    # Flat column -> value row
+    def toRow(self):
+        row = {}
+
+        def flatten(prefix, value):
+            if isinstance(value, dict):
+                for key, item in value.items():
+                    flatten(f"{prefix}.{key}" if prefix else str(key), item)
+            elif isinstance(value, list):
+                for i, item in enumerate(value):
+                    flatten(f"{prefix}.{i}", item)
+            else:
+                row[prefix] = value
+
+        stats = self.toDict()
+        for key in self.rowExclude:
+            del stats[key]
+        flatten("", stats)
+        return row
+
+    def toJSON(self):
+        return json.dumps(self.toDict(), indent=2)
+
+    def toCSV(self):
+        row = self.toRow()
+        output = io.StringIO()
+        writer = csv.DictWriter(output, fieldnames=list(row.keys()))
+        writer.writeheader()
+        writer.writerow(row)
+        return output.getvalue()
+
+    def save(self, fileName, format=None):
+        if format is None:
+            format = "csv" if fileName.endswith(".csv") else "json"
+        with open(fileName, "w", newline="") as f:
+            f.write(self.toCSV() if format == "csv" else self.toJSON())
+
+
+class SimulationResult(ResultFile):
+    # The per-interval timeline only goes to JSON
+    rowExclude = ["timeline"]
+
+    def __init__(self, config, cycles, counters, stalls, unitBusyCycles, registers, memory, BTB, loadStoreQueue):
+        self.config = {key: config[key] for key in ["NF", "NW", "NR", "NB", "NP", "NI", "ND", "predictor",
+                                                    "btbEntries", "loadQueue", "storeQueue", "memoryDependence"]}
+        self.cycles = cycles
+        self.committed = sum(counters.committed.values())
+        self.ipc = self.committed / cycles if cycles else 0.0
+        self.committedByOp = dict(counters.committed)
+        self.branches = counters.branches
+        self.mispredictions = counters.mispredictions
+        self.mispredictionRate = self.mispredictions / self.branches if self.branches else 0.0
+        self.mispredictionsByPC = dict(counters.mispredictionsByPC)
+        self.btbHits = BTB.hits
+        self.btbMisses = BTB.misses
+        self.flushes = counters.flushes
+        self.squashed = counters.squashed
+        self.forwards = loadStoreQueue.forwards
+        self.orderingStalls = loadStoreQueue.orderingStalls
+        self.memoryOrderViolations = loadStoreQueue.violations
+        self.stalls = dict(stalls)
+        self.unitBusyCycles = unitBusyCycles
+        self.rsOccupancy = counters.rsOccupancy
+        self.robOccupancy = counters.robOccupancy
+        self.cdbUsage = counters.cdbUsage
+        self.timeline = counters.timeline
+        self.registers = registers
+        self.memory = memory
+
+    def toDict(self):
+        return {
+            "config": self.config,
+            "cycles": self.cycles,
+            "committed": self.committed,
+            "ipc": self.ipc,
+            "committedByOp": self.committedByOp,
+            "branches": self.branches,
+            "mispredictions": self.mispredictions,
+            "mispredictionRate": self.mispredictionRate,
+            "mispredictionsByPC": self.mispredictionsByPC,
+            "btbHits": self.btbHits,
+            "btbMisses": self.btbMisses,
+            "flushes": self.flushes,
+            "squashed": self.squashed,
+            "forwards": self.forwards,
+            "orderingStalls": self.orderingStalls,
+            "memoryOrderViolations": self.memoryOrderViolations,
+            "stalls": self.stalls,
+            "unitBusyCycles": self.unitBusyCycles,
+            "rsOccupancy": self.rsOccupancy,
+            "robOccupancy": self.robOccupancy,
+            "cdbUsage": self.cdbUsage,
+            "timeline": self.timeline,
+            "registers": self.registers,
+        }
+
+
+# Architectural outcome of a functional-only run
+class FunctionalResult(ResultFile):
+    def __init__(self, emulator):
+        self.committed = emulator.instructions
+        self.committedByOp = dict(emulator.committed)
+        self.branches = emulator.branches
+        self.registers = emulator.registers
+        self.memory = emulator.MainMemory
+
+    def toDict(self):
+        return {
+            "committed": self.committed,
+            "committedByOp": self.committedByOp,
+            "branches": self.branches,
+            "registers": self.registers,
+        }
+
+
+# Whole-program CPI estimated from detailed samples, with a confidence interval on the mean
+class SampledResult(FunctionalResult):
+    rowExclude = ["samples"]
+
+    def __init__(self, config, emulator, samples, confidence=1.96):
+        FunctionalResult.__init__(self, emulator)
+        self.config = {key: config[key] for key in ["NF", "NW", "NR", "NB", "NP"]}
+        self.samples = samples
+        count = len(samples)
+        self.cpi = sum(samples) / count if count else None
+        self.cpiError = None
+        if count > 1:
+            variance = sum((cpi - self.cpi) ** 2 for cpi in samples) / (count - 1)
+            self.cpiError = confidence * math.sqrt(variance / count)
+        self.cycles = self.cpi * self.committed if count else None
+
+    def toDict(self):
+        stats = {"config": self.config}
+        stats.update(FunctionalResult.toDict(self))
+        stats.update({
+            "cycles": self.cycles,
+            "cpi": self.cpi,
+            "cpiLow": self.cpi - self.cpiError if self.cpiError is not None else None,
+            "cpiHigh": self.cpi + self.cpiError if self.cpiError is not None else None,
+            "sampleCount": len(self.samples),
+            "samples": self.samples,
+        })
+        return stats
+
+
+# Per-core and aggregate throughput of a multi-core run; cores that finish early stay idle until the last one is done
+class MultiCoreResult(ResultFile):
+    def __init__(self, config, programNames, coreResults, memory):
+        # Every core is built from the same configuration
+        self.config = dict(coreResults[0].config)
+        self.config.update(cores=len(coreResults), quantum=config.get('quantum', 1),
+                           memoryPorts=config.get('memoryPorts'), workers=config.get('workers', 0))
+        self.programNames = programNames
+        self.coreResults = coreResults
+        self.cycles = max(result.cycles for result in coreResults)
+        self.committed = sum(result.committed for result in coreResults)
+        self.ipc = self.committed / self.cycles if self.cycles else 0.0
+        self.portStalls = sum(result.portStalls for result in coreResults)
+        self.memory = memory
+
+    def toDict(self):
+        return {
+            "config": self.config,
+            "cycles": self.cycles,
+            "committed": self.committed,
+            "ipc": self.ipc,
+            "portStalls": self.portStalls,
+            "cores": [{
+                "program": program,
+                "cycles": result.cycles,
+                "committed": result.committed,
+                "ipc": result.ipc,
+                "mispredictions": result.mispredictions,
+                "forwards": result.forwards,
+                "memoryOrderViolations": result.memoryOrderViolations,
+                "portStalls": result.portStalls,
+                "stalls": result.stalls,
+                "registers": result.registers,
+            } for program, result in zip(self.programNames, self.coreResults)],
+        }
@@ -0,0 +1,188 @@
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import signal
+from Simulator.InstructionClass import Instruction
+from Simulator.Processor import Processor
+
+# Machine parameters a sweep can vary
+SWEEP_PARAMETERS = ["NF", "NW", "NR", "NB", "NP", "NI"]
+SWEEP_METHODS = ["grid", "random", "lhs"]
+SWEEP_RESULTS = ["cycles", "committed", "ipc", "mispredictions"]
+
+# Program and memory of the sweep, handed to each worker process once by the pool initializer
+sweepProgram = None
+sweepMemory = None
+
+
+# "1,2,4" -> [1, 2, 4]; "4:32:4" -> [4, 8, ..., 32], the stop value included
+def parseValues(text):
+    values = []
+    for item in text.split(","):
+        if ":" in item:
+            bounds = [int(value) for value in item.split(":")]
+            if len(bounds) not in [2, 3] or (len(bounds) == 3 and bounds[2] < 1):
+                raise ValueError(f"range '{item}' is not start:stop or start:stop:step with a positive step")
+            values += range(bounds[0], bounds[1] + 1, bounds[2] if len(bounds) == 3 else 1)
+        else:
+            values.append(int(item))
+    if not values:
+        raise ValueError(f"'{text}' holds no value")
+    return sorted(set(values))
+
+
+# Every combination of the parameter values
+def gridPoints(parameters):
+    names = list(parameters)
+    return [dict(zip(names, values)) for values in itertools.product(*parameters.values())]
+
+
+# samples distinct points drawn uniformly from the grid, without listing the whole grid
+def randomPoints(parameters, samples, rng):
+    names = list(parameters)
+    total = 1
+    for values in parameters.values():
+        total *= len(values)
+    points = []
+    for index in rng.sample(range(total), min(samples, total)):
+        point = {}
+        for name in reversed(names):
+            index, position = divmod(index, len(parameters[name]))
+            point[name] = parameters[name][position]
+        points.append({name: point[name] for name in names})
+    return points
+
+
+# Latin hypercube: each parameter's value list is cut into samples equal strata and every stratum is used by one
+# point, so each parameter's range is covered evenly with few points. Points that fall together are run once.
+def latinHypercubePoints(parameters, samples, rng):
+    strata = {}
+    for name in parameters:
+        strata[name] = list(range(samples))
+        rng.shuffle(strata[name])
+    points = []
+    for i in range(samples):
+        point = {}
+        for name, values in parameters.items():
+            point[name] = values[int((strata[name][i] + rng.random()) / samples * len(values))]
+        if point not in points:
+            points.append(point)
+    return points
+
+
+def samplePoints(parameters, method="grid", samples=16, seed=1):
+    if method == "grid":
+        return gridPoints(parameters)
+    rng = random.Random(seed)
+    if method == "random":
+        return randomPoints(parameters, samples, rng)
+    if method == "lhs":
+        return latinHypercubePoints(parameters, samples, rng)
+    raise ValueError(f"unknown sweep method '{method}', expected one of {', '.join(SWEEP_METHODS)}")
+
+
+# Raised in a worker when its run goes past the sweep's per-point time limit
+class PointTimeout(Exception):
+    pass
+
+
+def raiseTimeout(signalNumber, frame):
+    raise PointTimeout()
+
+
+def initWorker(program, memory):
+    global sweepProgram, sweepMemory
+    sweepProgram = program
+    sweepMemory = memory
+
+
+# One detailed run on a copy of the sweep's memory, logging to a file of its own or not at all. A configuration the
+# machine cannot run, such as too few physical registers, or one still running after timeout seconds gives a row with
+# its error instead of stopping the sweep. The time limit needs SIGALRM, without it (Windows) runs are not limited.
+def runPoint(run, point, config, logDirectory, timeout=None):
+    Instruction.id = 0
+    runConfig = dict(config, **point)
+    if logDirectory is None:
+        runConfig["traceLevel"] = "none"
+    else:
+        runConfig["logFile"] = os.path.join(logDirectory, f"run{run}.log")
+    row = dict({"run": run}, **point)
+    limited = timeout is not None and hasattr(signal, "SIGALRM")
+    if limited:
+        signal.signal(signal.SIGALRM, raiseTimeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        result = Processor(runConfig, sweepMemory.copy(), sweepProgram).begin()
+    except ValueError as error:
+        row["error"] = str(error)
+        return row
+    except PointTimeout:
+        row["error"] = f"no result after {timeout} seconds"
+        return row
+    finally:
+        if limited:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    row.update({"cycles": result.cycles, "committed": result.committed, "ipc": result.ipc,
+                "mispredictions": result.mispredictions})
+    for reason, cycles in result.stalls.items():
+        row[f"stalls.{reason}"] = cycles
+    return row
+
+
+# Every point on a pool of workers, rows in point order; report is called with each row in turn. Without a log
+# directory the runs do not log. Each run may take up to timeout seconds, None for no limit.
+def runSweep(program, memory, points, config, workers=None, logDirectory=None, report=None, timeout=None):
+    if logDirectory is not None:
+        os.makedirs(logDirectory, exist_ok=True)
+    rows = []
+    with multiprocessing.Pool(workers or os.cpu_count(), initializer=initWorker, initargs=(program, memory)) as pool:
+        tasks = [pool.apply_async(runPoint, (run, point, config, logDirectory, timeout))
+                 for run, point in enumerate(points)]
+        for task in tasks:
+            row = task.get()
+            rows.append(row)
+            if report is not None:
+                report(row)
+    return rows
+
+
+# Runs no other run beats: none is at least as fast with no swept parameter larger and is better in one of them
+def paretoFront(rows, parameters):
+    runs = [row for row in rows if "error" not in row]
+
+    def dominates(a, b):
+        costs = [(a[name], b[name]) for name in parameters] + [(a["cycles"], b["cycles"])]
+        return all(x <= y for x, y in costs) and any(x < y for x, y in costs)
+
+    front = [row for row in runs if not any(dominates(other, row) for other in runs)]
+    return sorted(front, key=lambda row: (row["cycles"], [row[name] for name in parameters]))
+
+
+def sweepColumns(rows, parameters):
+    stallColumns = []
+    for row in rows:
+        for key in row:
+            if key.startswith("stalls.") and key not in stallColumns:
+                stallColumns.append(key)
+    return ["run"] + list(parameters) + SWEEP_RESULTS + stallColumns + ["error"]
+
+
+def formatSweepRow(row, parameters):
+    point = " ".join(f"{name}={row[name]:<3}" for name in parameters)
+    if "error" in row:
+        return f"{row['run']:>5}  {point}  failed: {row['error']}"
+    return f"{row['run']:>5}  {point}  {row['cycles']:>9} cycles  IPC {row['ipc']:.3f}"
+
+
+# One row per run: CSV, or JSON for a .json file name
+def saveSweep(rows, parameters, fileName):
+    with open(fileName, "w", newline="") as f:
+        if fileName.endswith(".json"):
+            json.dump(rows, f, indent=2)
+        else:
+            writer = csv.DictWriter(f, fieldnames=sweepColumns(rows, parameters))
+            writer.writeheader()
+            writer.writerows(rows)
@@ -0,0 +1,47 @@
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+# Trace levels: each level also logs everything of the levels below it
+TRACE_NONE, TRACE_SUMMARY, TRACE_STAGE, TRACE_FULL = 0, 1, 2, 3
+TRACE_LEVELS = {"none": TRACE_NONE, "summary": TRACE_SUMMARY, "stage": TRACE_STAGE, "full": TRACE_FULL}
+
+
+# Blocks the simulator when the writer falls behind instead of dropping records
+class BlockingQueueHandler(QueueHandler):
+    def enqueue(self, record):
+        self.queue.put(record)
+
+
+class TraceLog:
+    def __init__(self, logFile, level, queueSize=10000):
+        self.logFile = logFile
+        self.level = level
+        self.queueSize = queueSize
+        self.handler = None
+        self.listener = None
+
+    # Truncate the log file and start the background writer thread
+    def start(self):
+        if self.level == TRACE_NONE:
+            return
+        fileHandler = logging.FileHandler(self.logFile, mode='w')
+        fileHandler.setFormatter(logging.Formatter('%(message)s'))
+        records = queue.Queue(self.queueSize)
+        self.handler = BlockingQueueHandler(records)
+        self.listener = QueueListener(records, fileHandler)
+        rootLogger = logging.getLogger()
+        rootLogger.setLevel(logging.INFO)
+        rootLogger.addHandler(self.handler)
+        self.listener.start()
+
+    # Drain the queue and close the log file
+    def stop(self):
+        if self.listener is None:
+            return
+        logging.getLogger().removeHandler(self.handler)
+        self.listener.stop()
+        for handler in self.listener.handlers:
+            handler.close()
+        self.handler = None
+        self.listener = None
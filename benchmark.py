@@ -0,0 +1,50 @@
+import argparse
+import tempfile
+from Simulator.Benchmark import compareBaseline, formatRow, loadBaseline, runSuite, saveBenchmarks, sweepConfigs, \
+    writeKernels
+from Simulator.KernelGenerator import BRANCH_PATTERNS, KERNEL_PRESETS
+
+
+def readList(text):
+    return [int(value) for value in text.split(",")]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure how fast the simulator runs: simulated cycles and "
+                                                 "instructions per second and peak memory, over synthetic kernels and "
+                                                 "the shipped program, for a sweep of NR/NW/NB")
+    parser.add_argument('--kernels', help="Synthetic kernel presets to run", nargs="*", choices=list(KERNEL_PRESETS),
+                        default=list(KERNEL_PRESETS))
+    parser.add_argument('--program', help="Program run besides the kernels (none: skip it)", default="program.txt")
+    parser.add_argument('--memory', help="Memory file of --program", default="memory.txt")
+    parser.add_argument('--trips', help="Loop iterations of every kernel", default=500)
+    parser.add_argument('--depth', help="Add a custom kernel with this dependency-chain depth", default=None)
+    parser.add_argument('--body', help="Custom kernel: instructions per iteration", default=16)
+    parser.add_argument('--mix', help="Custom kernel: op weights, e.g. fadd:2,fmul:1,fld:1",
+                        default="fadd:2,fmul:1,add:1,fld:1,fsd:1")
+    parser.add_argument('--branch', help="Custom kernel: branch outcome pattern", choices=BRANCH_PATTERNS,
+                        default="none")
+    parser.add_argument('--footprint', help="Custom kernel: bytes each load/store walks through", default=4096)
+    parser.add_argument('--NR', help="ROB sizes to sweep", default="16,64,256")
+    parser.add_argument('--NW', help="Issue widths to sweep, fetch width follows", default="4,16")
+    parser.add_argument('--NB', help="Common data buses to sweep", default="4,16")
+    parser.add_argument('--repeat', help="Timed runs per point, the fastest is kept", default=1)
+    parser.add_argument('--kernel-dir', help="Keep the generated kernels in this directory", default=None)
+    parser.add_argument('--baseline', help="Earlier JSON results to compare throughput against", default=None)
+    parser.add_argument('--out', help="Results file (.json or .csv)", default="benchmark.json")
+    args = parser.parse_args()
+    kernels = {name: KERNEL_PRESETS[name] for name in args.kernels}
+    if args.depth is not None:
+        kernels["custom"] = {"depth": int(args.depth), "body": int(args.body), "mix": args.mix,
+                             "branch": args.branch, "footprint": int(args.footprint)}
+    configs = sweepConfigs(readList(args.NR), readList(args.NW), readList(args.NB))
+    with tempfile.TemporaryDirectory() as temporaryDirectory:
+        workloads = writeKernels(kernels, args.kernel_dir or temporaryDirectory, int(args.trips))
+        if args.program != "none":
+            workloads.insert(0, ("program", args.program, args.memory))
+        rows = runSuite(workloads, configs, int(args.repeat), lambda row: print(formatRow(row)))
+    saveBenchmarks(rows, args.out)
+    if args.baseline is not None:
+        for row, ratio in compareBaseline(rows, loadBaseline(args.baseline)):
+            print(f"{formatRow(row)}  {ratio:.2f}x baseline")
+    print(f"{len(rows)} runs written to {args.out}")
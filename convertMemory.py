@@ -0,0 +1,9 @@
+import argparse
+from Simulator.Memory import loadMemory, saveMemory
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Convert a memory file between text and binary image formats")
+    parser.add_argument('source', help="Memory file to read (.npy, .bin/.raw word image, or text)")
+    parser.add_argument('destination', help="Memory file to write, format from its extension")
+    args = parser.parse_args()
+    saveMemory(loadMemory(args.source), args.destination)
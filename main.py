@@ -1,24 +1,16 @@
 import argparse
 from Simulator import Processor as CPU
-
-
-class InstructionFileReader:
-    def __init__(self, instructionCount):
-        self.reference = {}
-        self.instructions = [None] * (instructionCount * 4)
-
-    def decode(self, lines):
-        for i in range(len(lines)):
-            line = lines[i]
-            if ":" in line:
-                refer, line = line.split(":")
-                self.reference[refer] = i * 4
-            if "bne" in line:
-                for key in self.reference.keys():
-                    if key in line:
-                        line = line.replace(key, str(self.reference[key]))
-            self.instructions[i * 4] = line.replace("\n", "").strip()
-        return self.instructions
+from Simulator.Assembler import assembleFile
+from Simulator.FunctionalEmulator import FunctionalEmulator
+from Simulator.SampledSimulation import SampledSimulation
+from Simulator.SimulationResult import FunctionalResult
+from Simulator.Checkpoint import loadCheckpoint
+from Simulator.MachineDescription import readMachineFile
+from Simulator.BranchPredictor import PREDICTORS
+from Simulator.Memory import loadMemory, saveMemory
+from Simulator.LoadStoreQueue import MEMORY_DEPENDENCE_PREDICTORS
+from Simulator.InstructionTrace import InstructionTrace, TraceProcessor, TraceWriter, readTrace
+from Simulator.MultiCore import MultiCoreSimulation
 
 
 def readConfigurationFile(configFile):
@@ -27,43 +19,175 @@ def readConfigurationFile(configFile):
 
 
 def readProgramFile(programFile):
-    file = open(programFile, "r")
-    lines = file.readlines()
-    file.close()
-    instruct = InstructionFileReader(len(lines))
-    program = instruct.decode(lines)
-    return program
+    return assembleFile(programFile)
 
 
 def readMemoryFile(memoryFile):
-    file = open(memoryFile, "r")
-    lines = file.readlines()
-    file.close()
-    length = int(lines[-1].split(",")[0].strip()) + 1
-    RAM = [0] * length
-    for i in range(len(lines)):
-        line = lines[i]
-        address, value = line.split(",")
-        address, value = int(address.strip()), int(value.strip())
-        RAM[address] = value
-    return RAM
+    return loadMemory(memoryFile)
 
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="Enter the program file name")
     parser.add_argument('--I_file_name', help="Program File", default="program.txt")
     parser.add_argument('--M_file_name', help="Memory Program File", default="memory.txt")
+    parser.add_argument('--memory-out', help="Write the final memory here (.npy, .bin/.raw word image, or text)",
+                        default=None)
     parser.add_argument('--NF', help="NF", default=4)
     parser.add_argument('--NW', help="NW", default=4)
     parser.add_argument('--NR', help="NR", default=16)
     parser.add_argument('--NB', help="NB", default=4)
+    parser.add_argument('--NP', help="Physical Registers", default=32)
+    parser.add_argument('--NI', help="Instruction queue entries", default=16)
+    parser.add_argument('--ND', help="Instructions decoded per cycle (default: NF)", default=None)
+    parser.add_argument('--predictor', help="Branch direction predictor", choices=PREDICTORS, default="1bit")
+    parser.add_argument('--bp-entries', help="Branch predictor table entries (power of two)", default=1024)
+    parser.add_argument('--bp-history', help="Global history bits for gshare and tournament", default=8)
+    parser.add_argument('--btb-entries', help="Branch target buffer entries (power of two)", default=16)
+    parser.add_argument('--lq-size', help="Load queue entries", default=16)
+    parser.add_argument('--sq-size', help="Store queue entries", default=16)
+    parser.add_argument('--mem-dep-predictor', help="Memory dependence predictor letting loads speculate past older "
+                                                    "stores with unknown addresses (none: always wait)",
+                        choices=MEMORY_DEPENDENCE_PREDICTORS, default="none")
+    parser.add_argument('--mdp-entries', help="Memory dependence predictor entries (power of two)", default=1024)
+    parser.add_argument('--machine', help="Machine description file (functional units and reservation stations)",
+                        default=None)
+    parser.add_argument('--trace-level', help="Log verbosity", choices=["none", "summary", "stage", "full"],
+                        default="full")
+    parser.add_argument('--log-file', help="Simulation log file (default: logs/simulationLogs)", default=None)
+    parser.add_argument('--cache-dir', help="Result cache of detailed runs, only used with --trace-level none (the "
+                                            "default full trace always simulates)",
+                        default="logs/resultCache")
+    parser.add_argument('--cache-size', help="Result cache size bound in MB, least recently used results go first",
+                        default=256)
+    parser.add_argument('--no-cache', help="Always simulate, neither reading nor writing the result cache",
+                        action="store_true")
+    parser.add_argument('--pipeline-trace', help="Binary pipeline trace file", default=None)
+    parser.add_argument('--keyframe-interval', help="Cycles between pipeline trace keyframes", default=1000)
+    parser.add_argument('--stats-file', help="Write run statistics to this file", default=None)
+    parser.add_argument('--profile', help="Write the per-PC stall profile report to this file", default=None)
+    parser.add_argument('--profile-folded', help="Write the per-PC stall profile as folded stacks for flame graph "
+                                                 "tools to this file", default=None)
+    parser.add_argument('--chrome-trace', help="Stream every instruction's pipeline stages to this Chrome "
+                                               "trace-event JSON file", default=None)
+    parser.add_argument('--konata', help="Stream every instruction's pipeline stages to this Konata log file",
+                        default=None)
+    parser.add_argument('--stats-format', help="Statistics format (default: from file extension)",
+                        choices=["json", "csv"], default=None)
+    parser.add_argument('--sample-interval', help="Cycles per ROB/CDB timeline sample", default=100)
+    parser.add_argument('--event-driven', help="Skip idle cycles up to the next functional unit completion",
+                        action="store_true")
+    parser.add_argument('--checkpoint-file', help="Checkpoint file written during the run (default: logs/checkpoint.bin)",
+                        default=None)
+    parser.add_argument('--checkpoint-every', help="Checkpoint every N cycles", default=None)
+    parser.add_argument('--checkpoint-pc', help="Checkpoint once the instruction at this PC first commits",
+                        default=None)
+    parser.add_argument('--restore', help="Resume a detailed run from this checkpoint file", default=None)
+    parser.add_argument('--mode', help="detailed: full timing model, functional: architectural state only, "
+                                       "sampled: functional fast-forward with periodic detailed samples, "
+                                       "trace: timing model fed from --trace-file instead of the program, "
+                                       "multicore: one detailed core per program over a shared memory",
+                        choices=["detailed", "functional", "sampled", "trace", "multicore"], default="detailed")
+    parser.add_argument('--trace-file', help="Instruction trace for --mode trace (.gz, .bz2, .xz or plain text)",
+                        default=None)
+    parser.add_argument('--trace-out', help="Write the instruction trace of a functional run to this file",
+                        default=None)
+    parser.add_argument('--sample-period', help="Instructions between detailed samples", default=1000)
+    parser.add_argument('--sample-warmup', help="Detailed warm-up instructions before each sample", default=100)
+    parser.add_argument('--sample-size', help="Instructions measured per detailed sample", default=100)
+    parser.add_argument('--programs', help="Program of each core for --mode multicore (default: I_file_name on "
+                                           "every core)", nargs="+", default=None)
+    parser.add_argument('--cores', help="Cores running I_file_name when --programs is not given", default=2)
+    parser.add_argument('--quantum', help="Cycles the cores run between making their stores visible to each other",
+                        default=1)
+    parser.add_argument('--memory-ports', help="Shared memory ports, handed out round robin (default: one per core, "
+                                               "no contention)", default=None)
+    parser.add_argument('--workers', help="Processes the cores are spread over (0: run them all in this one)",
+                        default=0)
     args = parser.parse_args()
+    if args.mode == "trace" and args.trace_file is None:
+        parser.error("--mode trace needs --trace-file")
+    if args.mode in ["trace", "multicore"] and (args.restore or args.checkpoint_every or args.checkpoint_pc):
+        parser.error(f"--mode {args.mode} runs cannot be checkpointed")
     programFile = args.I_file_name
     memoryFile = args.M_file_name
-    config = readConfigurationFile({"NF": int(args.NF), "NW": int(args.NW), "NR": int(args.NR), "NB": int(args.NB)})
-    instructionFile = readProgramFile(programFile)
-    MainMemory = readMemoryFile(memoryFile)
+    config = readConfigurationFile({"NF": int(args.NF), "NW": int(args.NW), "NR": int(args.NR), "NB": int(args.NB),
+                                   "NP": int(args.NP), "NI": int(args.NI),
+                                   "ND": int(args.ND) if args.ND is not None else int(args.NF),
+                                   "traceLevel": args.trace_level,
+                                   "logFile": args.log_file,
+                                   "cacheDir": None if args.no_cache else args.cache_dir,
+                                   "cacheSize": int(float(args.cache_size) * 1024 * 1024),
+                                   "predictor": args.predictor, "predictorEntries": int(args.bp_entries),
+                                   "historyBits": int(args.bp_history), "btbEntries": int(args.btb_entries),
+                                   "loadQueue": int(args.lq_size), "storeQueue": int(args.sq_size),
+                                   "memoryDependence": args.mem_dep_predictor,
+                                   "memoryDependenceEntries": int(args.mdp_entries),
+                                   "memoryOut": args.memory_out,
+                                   "profile": args.profile, "profileFolded": args.profile_folded,
+                                   "chromeTrace": args.chrome_trace, "konata": args.konata,
+                                   "machine": readMachineFile(args.machine) if args.machine is not None else None,
+                                   "pipelineTrace": args.pipeline_trace, "keyframeInterval": int(args.keyframe_interval),
+                                   "sampleInterval": int(args.sample_interval),
+                                   "eventDriven": args.event_driven,
+                                   "samplePeriod": int(args.sample_period), "sampleWarmup": int(args.sample_warmup),
+                                   "sampleSize": int(args.sample_size),
+                                   "checkpointFile": args.checkpoint_file,
+                                   "checkpointEvery": int(args.checkpoint_every) if args.checkpoint_every is not None else None,
+                                   "checkpointPC": int(args.checkpoint_pc) if args.checkpoint_pc is not None else None,
+                                   "quantum": int(args.quantum), "workers": int(args.workers),
+                                   "memoryPorts": int(args.memory_ports) if args.memory_ports is not None else None})
+    # A trace carries the instructions and addresses, it needs neither the program nor the memory
+    if args.mode != "trace":
+        instructionFile = readProgramFile(programFile)
+        MainMemory = readMemoryFile(memoryFile)
     print("Running Simulation....")
-    simulation = CPU.Processor(config, MainMemory, instructionFile)
-    simulation.begin()
-    print("Simulation Complete, please check logs/simulationLogs for results")
+    if args.mode == "functional":
+        emulator = FunctionalEmulator(MainMemory, instructionFile)
+        if args.trace_out is not None:
+            emulator.traceWriter = TraceWriter(args.trace_out)
+        try:
+            emulator.run()
+        finally:
+            if emulator.traceWriter is not None:
+                emulator.traceWriter.close()
+        result = FunctionalResult(emulator)
+        message = f"Functional Emulation Complete: {result.committed} instructions"
+    elif args.mode == "sampled":
+        result = SampledSimulation(config, MainMemory, instructionFile).run()
+        if result.cpi is None:
+            message = f"Sampled Simulation Complete: {result.committed} instructions, no detailed sample measured"
+        elif result.cpiError is None:
+            message = f"Sampled Simulation Complete: {result.committed} instructions, CPI {result.cpi:.3f} " \
+                      f"(single sample, no confidence interval)"
+        else:
+            message = f"Sampled Simulation Complete: {result.committed} instructions, CPI {result.cpi:.3f} " \
+                      f"+/- {result.cpiError:.3f} (95%), about {result.cycles:.0f} cycles"
+    elif args.mode == "multicore":
+        programFiles = args.programs or [programFile] * int(args.cores)
+        programs = [readProgramFile(fileName) for fileName in programFiles]
+        result = MultiCoreSimulation(config, MainMemory, programs, programFiles).run()
+        message = f"Multi-core Simulation Complete: {len(programs)} cores in {result.cycles} cycles " \
+                  f"(aggregate IPC {result.ipc:.3f}, per core " \
+                  f"{', '.join(f'{core.ipc:.3f}' for core in result.coreResults)})"
+    elif args.mode == "trace":
+        simulation = TraceProcessor(config, InstructionTrace(readTrace(args.trace_file)))
+        result = simulation.begin()
+        message = f"Trace Simulation Complete in {result.cycles} cycles (IPC {result.ipc:.3f}), please check {simulation.logFile} for results"
+    else:
+        if args.restore is not None:
+            # The checkpoint carries its own program, memory and machine configuration
+            simulation = loadCheckpoint(args.restore)
+            simulation.setRunOptions(config)
+        else:
+            simulation = CPU.Processor(config, MainMemory, instructionFile)
+        result = simulation.begin()
+        if simulation.fromCache:
+            message = f"Simulation Complete in {result.cycles} cycles (IPC {result.ipc:.3f}), from the result cache"
+        else:
+            message = f"Simulation Complete in {result.cycles} cycles (IPC {result.ipc:.3f}), please check {simulation.logFile} for results"
+    # The detailed model writes its own final memory; the other modes leave it in the functional emulator's copy
+    if args.mode in ["functional", "sampled", "multicore"] and args.memory_out is not None:
+        saveMemory(MainMemory, args.memory_out)
+    if args.stats_file is not None:
+        result.save(args.stats_file, args.stats_format)
+    print(message)
@@ -0,0 +1,17 @@
+import argparse
+from Simulator.PipelineTrace import PipelineTraceReader, formatState
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Rebuild the machine state at a cycle from a pipeline trace")
+    parser.add_argument('trace', help="Pipeline trace file written with main.py --pipeline-trace")
+    parser.add_argument('--cycle', help="Cycle(s) to show, e.g. 25 or 20-30", default=None)
+    args = parser.parse_args()
+    reader = PipelineTraceReader(args.trace)
+    lastCycle = reader.lastCycle()
+    if args.cycle is None:
+        print(f"Trace of {lastCycle + 1} cycles, {len(reader.index)} keyframes every {reader.keyframeInterval} cycles")
+    else:
+        first, _, last = args.cycle.partition("-")
+        for cycle in range(int(first), int(last or first) + 1):
+            print(formatState(reader.stateAt(cycle)))
+    reader.close()
@@ -0,0 +1,64 @@
+import argparse
+from Simulator.Assembler import assembleFile
+from Simulator.BranchPredictor import PREDICTORS
+from Simulator.MachineDescription import readMachineFile
+from Simulator.Memory import loadMemory
+from Simulator.Sweep import SWEEP_METHODS, SWEEP_PARAMETERS, formatSweepRow, paretoFront, parseValues, runSweep, \
+    samplePoints, saveSweep
+
+# Values of each parameter when it is not swept, those of main.py
+SWEEP_DEFAULTS = {"NF": "4", "NW": "4", "NR": "16", "NB": "4", "NP": "32", "NI": "16"}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run the detailed simulator over a design space of NF/NW/NR/NB/NP/NI "
+                                                 "in parallel, write one row per configuration and print the "
+                                                 "Pareto-optimal ones")
+    parser.add_argument('--program', help="Program file", default="program.txt")
+    parser.add_argument('--memory', help="Memory file", default="memory.txt")
+    for name in SWEEP_PARAMETERS:
+        parser.add_argument(f'--{name}', help=f"{name} values: a list like 1,2,4 and/or ranges start:stop[:step]",
+                            default=SWEEP_DEFAULTS[name])
+    parser.add_argument('--method', help="grid: every combination, random: --samples distinct combinations, lhs: "
+                                         "--samples combinations by Latin hypercube", choices=SWEEP_METHODS,
+                        default="grid")
+    parser.add_argument('--samples', help="Configurations drawn by --method random or lhs", default=16)
+    parser.add_argument('--seed', help="Random seed of --method random or lhs", default=1)
+    parser.add_argument('--workers', help="Worker processes (default: one per CPU)", default=None)
+    parser.add_argument('--timeout', help="Seconds a configuration may run before it is recorded as failed",
+                        default=600)
+    parser.add_argument('--predictor', help="Branch direction predictor", choices=PREDICTORS, default="1bit")
+    parser.add_argument('--machine', help="Machine description file (functional units and reservation stations)",
+                        default=None)
+    parser.add_argument('--event-driven', help="Skip idle cycles up to the next functional unit completion",
+                        action="store_true")
+    parser.add_argument('--trace-level', help="Log verbosity of every run, each to its own file in --log-dir",
+                        choices=["none", "summary", "stage", "full"], default="none")
+    parser.add_argument('--log-dir', help="Directory of the per-run log files", default="logs/sweep")
+    parser.add_argument('--cache-dir', help="Result cache shared with main.py", default="logs/resultCache")
+    parser.add_argument('--cache-size', help="Result cache size bound in MB", default=256)
+    parser.add_argument('--no-cache', help="Simulate every point, neither reading nor writing the result cache",
+                        action="store_true")
+    parser.add_argument('--out', help="Results file (.csv, or .json)", default="sweep.csv")
+    args = parser.parse_args()
+    try:
+        parameters = {name: parseValues(getattr(args, name)) for name in SWEEP_PARAMETERS}
+    except ValueError as error:
+        parser.error(str(error))
+    points = samplePoints(parameters, args.method, int(args.samples), int(args.seed))
+    config = {"traceLevel": args.trace_level, "predictor": args.predictor, "eventDriven": args.event_driven,
+              "machine": readMachineFile(args.machine) if args.machine is not None else None,
+              "cacheDir": None if args.no_cache else args.cache_dir,
+              "cacheSize": int(float(args.cache_size) * 1024 * 1024)}
+    # Assembled and loaded once, each worker receives them when it starts
+    program = assembleFile(args.program)
+    memory = loadMemory(args.memory)
+    print(f"Sweeping {len(points)} configurations....")
+    rows = runSweep(program, memory, points, config, int(args.workers) if args.workers is not None else None,
+                    args.log_dir if args.trace_level != "none" else None,
+                    lambda row: print(formatSweepRow(row, SWEEP_PARAMETERS)), float(args.timeout))
+    saveSweep(rows, SWEEP_PARAMETERS, args.out)
+    print("Pareto-optimal configurations (no other is as fast without a larger parameter):")
+    for row in paretoFront(rows, SWEEP_PARAMETERS):
+        print(formatSweepRow(row, SWEEP_PARAMETERS))
+    print(f"{len(rows)} runs written to {args.out}")